@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+"""Compare the talks loaders on a synthetic talks file."""
+import argparse
+import datetime
+import random
+import tracemalloc
+from time import perf_counter
+
+import common
+
+ABSTRACT_WORDS = (
+    "quantum transport topological superconductor disorder phase transition "
+    "numerical simulation spin chain entanglement measurement device"
+).split()
+
+
+def synthetic_talks(num_talks: int) -> str:
+    """Generate a talks file with ``num_talks`` talks resembling the real ones."""
+    rng = random.Random(0)
+    start = datetime.datetime(2020, 5, 1, 15)
+    entries = []
+    for i in range(num_talks):
+        abstract = "\n    ".join(
+            " ".join(rng.choices(ABSTRACT_WORDS, k=12)) for _ in range(8)
+        )
+        entries.append(
+            f"- title: Talk number {i} on {rng.choice(ABSTRACT_WORDS)}\n"
+            f"  speaker_name: Speaker {i}\n"
+            f"  speaker_affiliation: University {i % 100}\n"
+            f"  email: speaker{i}@example.org\n"
+            f"  authors: Speaker {i}, Coauthor {i}\n"
+            f"  abstract: |\n    {abstract}\n"
+            f"  time: {start + datetime.timedelta(hours=6 * i):%Y-%m-%d %H:%M:%S}\n"
+            f"  event_type: {rng.choice(['speakers_corner', 'lrc'])}\n"
+            f"  workflow_issue: {1000 + i}\n"
+            f"  zoom_meeting_id: {80000000000 + i}\n"
+            f"  registration_url: https://zoom.us/meeting/register/{i}\n"
+            f"  youtube_id: video{i}\n"
+        )
+    return "# Synthetic talks file\n" + "".join(entries)
+
+
+def best_time(function, text: str, repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        start = perf_counter()
+        function(text)
+        times.append(perf_counter() - start)
+    return min(times)
+
+
+def memory_use(function, *args) -> int:
+    """Return the memory held by the result of ``function(*args)`` in bytes."""
+    tracemalloc.start()
+    result = function(*args)
+    used, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return used
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--talks", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    text = synthetic_talks(args.talks)
+    print(f"{args.talks} talks, {len(text) / 2**20:.1f} MiB, best of {args.repeat}")
+    print(f"Fast loader: {common.FastLoader.__name__}")
+    for name, function in [
+        ("round-trip (parse_talks)", common.parse_talks),
+        ("read-only (read_talks)", common.parse_talks_readonly),
+    ]:
+        print(f"{name:>25}: {best_time(function, text, args.repeat):.2f} s")
+
+    print("Memory held by the loaded talks:")
+    for name, function in [
+        ("dictionaries", common.parse_talks_readonly),
+        ("Talk records", common.parse_talk_records),
+    ]:
+        print(f"{name:>25}: {memory_use(function, text) / 2**20:.1f} MiB")
@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+"""Compare the video trimming methods on a synthetic recording."""
+import argparse
+import datetime
+import tempfile
+from pathlib import Path
+from subprocess import check_call
+from time import perf_counter
+
+import video
+
+
+def synthetic_video(path: Path, duration: int, keyint: int):
+    """Generate a test pattern video with a tone, encoded like a recording."""
+    check_call([
+        "ffmpeg", "-y", "-hide_banner", "-loglevel", "error",
+        "-f", "lavfi", "-i", f"testsrc=duration={duration}:size=1280x720:rate=25",
+        "-f", "lavfi", "-i", f"sine=duration={duration}",
+        "-c:v", "libx264", "-pix_fmt", "yuv420p", "-g", str(keyint),
+        "-c:a", "aac", path,
+    ])
+
+
+def timed(function, *args) -> float:
+    start = perf_counter()
+    function(*args)
+    return perf_counter() - start
+
+
+def filter_graph(input, intervals, output):
+    check_call(
+        video.convert_command.render(input=input, intervals=intervals, output=output),
+        shell=True,
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--duration", type=int, default=600, help="seconds")
+    parser.add_argument("--keyint", type=int, default=250, help="frames between keyframes")
+    parser.add_argument("--workers", type=int, default=video.TRIM_WORKERS)
+    args = parser.parse_args()
+
+    third = args.duration // 3
+    intervals = [
+        [datetime.timedelta(seconds=start), datetime.timedelta(seconds=end)]
+        for start, end in [
+            (17, third), (third + 23, 2 * third), (2 * third + 11, args.duration - 7)
+        ]
+    ]
+    with tempfile.TemporaryDirectory() as directory:
+        input = Path(directory) / "recording.mp4"
+        output = str(Path(directory) / "trimmed.mp4")
+        synthetic_video(input, args.duration, args.keyint)
+        print(f"{args.duration} s video, intervals {[[str(t) for t in i] for i in intervals]}")
+        for name, function, workers in [
+            ("filter graph", filter_graph, None),
+            ("slices, 1 worker", video.trim_slices, 1),
+            (f"slices, {args.workers} workers", video.trim_slices, args.workers),
+            (f"copy, {args.workers} workers", video.trim_copy, args.workers),
+        ]:
+            extra = () if workers is None else (workers,)
+            print(f"{name:>20}: {timed(function, str(input), intervals, output, *extra):.1f} s")
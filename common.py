@@ -1,25 +1,87 @@
 import os
-from time import time
+import re
+from time import time, monotonic
 import json
+import fcntl
+import base64
+import pickle
+import zlib
+import sqlite3
+import email.utils
+import contextlib
+import random
+import bisect
+import itertools
+import collections.abc
+import hashlib
+import operator
+import functools
+import threading
+from pathlib import Path
 from io import StringIO
+from typing import Iterator
+from concurrent import futures
+from concurrent.futures import ThreadPoolExecutor
 import markdown
+import jinja2
 
 import requests
 import github
 import datetime
 import logging
 from time import sleep
+import yaml as pyyaml
 from ruamel.yaml import YAML
 
 yaml = YAML()
+# Writes single talk fields, each on one line however long it is.
+field_yaml = YAML()
+field_yaml.width = 2**31 - 1
+# Fast loader for read-only access, C-accelerated if libyaml is available.
+FastLoader = getattr(pyyaml, "CSafeLoader", pyyaml.SafeLoader)
 
 ZOOM_API = "https://api.zoom.us/v2/"
+ZOOM_MAX_PAGE_SIZE = 300
+# Requests per second in each rate limit category of the Zoom API (Pro plan), see
+# https://developers.zoom.us/docs/api/rest/rate-limits/
+ZOOM_RATE_LIMITS = {"Light": 30, "Medium": 20, "Heavy": 10, "Resource-intensive": 10 / 60}
+# Categories of the endpoints we use, others are assumed to be Light.
+ZOOM_RATE_CATEGORIES = {
+    ("GET", "users"): "Medium",
+    ("GET", "users/{id}/meetings"): "Medium",
+    ("POST", "users/{id}/meetings"): "Medium",
+    ("GET", "meetings/{id}/registrants"): "Medium",
+}
+ZOOM_MAX_RETRIES = 5  # Retries of throttled requests
+ZOOM_MAX_RETRY_WAIT = 60  # Longest wait in seconds before retrying a throttled request
 SPEAKERS_CORNER_USER_ID = "D0n5UNEHQiajWtgdWLlNSA"
 VSF_USER_ID = "iJFotmmLRgOHJrTe9MKHRA"
 TALKS_FILE = "talks.yml"
+# Lists the yearly shards with talks moved out of TALKS_FILE, see migrate_talks.py
+ARCHIVE_MANIFEST = "talks/manifest.yml"
+
+# Local state shared between runs: cached tokens, data and downloads.
+CACHE_DIR = Path(os.getenv("VSF_CACHE_DIR", Path.home() / ".cache" / "vsf"))
+ZOOM_TOKEN_MARGIN = 300  # Refresh the Zoom token this many seconds before it expires
 
 MAILGUN_BASE_URL = "https://api.eu.mailgun.net/v3/"
 MAILGUN_DOMAIN = "mail.virtualscienceforum.org/"
+MAILGUN_BATCH_SIZE = 1000  # Most recipients Mailgun accepts in a single message
+MAILGUN_WORKERS = 4  # Messages sent concurrently
+OUTBOX_ATTEMPTS = 3  # Attempts to send a message during a single flush
+OUTBOX_MAX_ATTEMPTS = 9  # Attempts to send a message before giving up
+OUTBOX_RETENTION = datetime.timedelta(days=90)  # Remember sent messages this long
+MAILGUN_MEMBERS_BATCH_SIZE = 1000  # Most members Mailgun adds to a list in one request
+# Refresh the local copy of mailing list members after this time, see sync_mailing_list.
+MAILING_LIST_SNAPSHOT_MAX_AGE = datetime.timedelta(days=7)
+
+# Connection pooling of the shared HTTP session, see ``make_session``.
+HTTP_POOL_CONNECTIONS = int(os.getenv("VSF_HTTP_POOL_CONNECTIONS", 10))  # Hosts
+HTTP_POOL_MAXSIZE = int(os.getenv("VSF_HTTP_POOL_MAXSIZE", 10))  # Connections per host
+HTTP_TIMEOUT = (  # Connect and read timeouts in seconds
+    float(os.getenv("VSF_HTTP_CONNECT_TIMEOUT", 10)),
+    float(os.getenv("VSF_HTTP_READ_TIMEOUT", 60)),
+)
 
 class CollectExceptions:
     def __init__(self):
@@ -57,10 +119,93 @@ def wait_until(minute):
     sleep((desired - now).total_seconds())
 
 
-def make_zoom_headers() -> callable:
+class PooledAdapter(requests.adapters.HTTPAdapter):
+    """An HTTP adapter that applies a default timeout to every request."""
+
+    __attrs__ = requests.adapters.HTTPAdapter.__attrs__ + ["timeout"]
+
+    def __init__(self, timeout=HTTP_TIMEOUT, **kwargs):
+        self.timeout = timeout
+        super().__init__(**kwargs)
+
+    def send(self, request, timeout=None, **kwargs):
+        return super().send(request, timeout=timeout or self.timeout, **kwargs)
+
+
+def make_session(
+    pool_connections=HTTP_POOL_CONNECTIONS,
+    pool_maxsize=HTTP_POOL_MAXSIZE,
+    timeout=HTTP_TIMEOUT,
+) -> requests.Session:
+    """Create a session keeping connections alive in per-host pools.
+
+    pool_connections : int
+        Number of hosts for which a connection pool is kept.
+    pool_maxsize : int
+        Maximal number of connections kept alive to a single host.
+    timeout : float or tuple(float, float)
+        Default connect and read timeouts, used unless a request sets its own.
+    """
+    session = requests.Session()
+    adapter = PooledAdapter(
+        timeout=timeout,
+        pool_connections=pool_connections,
+        pool_maxsize=pool_maxsize,
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+session = make_session()
+
+
+def connection_stats(session=session) -> dict:
+    """Count requests, opened connections and reused connections per host."""
+    stats = {}
+    for adapter in set(session.adapters.values()):
+        pools = adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools[key]
+            host = stats.setdefault(pool.host, {"requests": 0, "connections": 0})
+            host["requests"] += pool.num_requests
+            host["connections"] += pool.num_connections
+
+    for host in stats.values():
+        host["reused"] = host["requests"] - host["connections"]
+    return stats
+
+
+def atomic_write(path: Path, data: bytes):
+    """Replace the contents of a file so that readers never see a partial write.
+
+    The file is only readable by the current user.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    with os.fdopen(os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def make_zoom_headers(cache_dir=CACHE_DIR) -> callable:
+    """Make a function returning Zoom API headers with a valid OAuth token.
+
+    The token is stored in ``cache_dir`` together with its expiration, so that
+    other processes reuse it. It is refreshed ``ZOOM_TOKEN_MARGIN`` seconds
+    before expiring, and only by one thread or process at a time.
+    """
+    lock = threading.Lock()
     expiration = time()
     token = None
 
+    def read_cached(path):
+        try:
+            cached = json.loads(path.read_text())
+            return cached["access_token"], cached["expiration"]
+        except (OSError, ValueError, KeyError):
+            return None, 0
+
     def zoom_headers() -> dict:
         zoom_account_id = os.getenv("ZOOM_ACCOUNT_ID")
         zoom_client_id = os.getenv("ZOOM_CLIENT_ID")
@@ -68,19 +213,33 @@ def make_zoom_headers() -> callable:
 
         nonlocal expiration
         nonlocal token
-        if time() > expiration or token is None:
-            # Get a new token
-            response = requests.post(
-                "https://zoom.us/oauth/token",
-                data={
-                    "grant_type": "account_credentials",
-                    "account_id": zoom_account_id,
-                },
-                auth=(zoom_client_id, zoom_client_secret)
-            )
-            response.raise_for_status()
-            token = response.json()["access_token"]
-            expiration = time() + response.json()["expires_in"]
+        with lock:
+            if time() > expiration - ZOOM_TOKEN_MARGIN or token is None:
+                credentials_id = hashlib.sha256(
+                    f"{zoom_account_id}:{zoom_client_id}".encode()
+                ).hexdigest()[:16]
+                path = Path(cache_dir) / f"zoom_token_{credentials_id}.json"
+                path.parent.mkdir(parents=True, exist_ok=True)
+                with open(path.with_suffix(".lock"), "w") as lock_file:
+                    # Other processes may be refreshing the token right now.
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                    token, expiration = read_cached(path)
+                    if time() > expiration - ZOOM_TOKEN_MARGIN or token is None:
+                        # Get a new token
+                        response = session.post(
+                            "https://zoom.us/oauth/token",
+                            data={
+                                "grant_type": "account_credentials",
+                                "account_id": zoom_account_id,
+                            },
+                            auth=(zoom_client_id, zoom_client_secret)
+                        )
+                        response.raise_for_status()
+                        token = response.json()["access_token"]
+                        expiration = time() + response.json()["expires_in"]
+                        atomic_write(path, json.dumps(
+                            {"access_token": token, "expiration": expiration}
+                        ).encode())
 
         return {'authorization': f'Bearer {token}', 'content-type': 'application/json'}
 
@@ -89,18 +248,90 @@ def make_zoom_headers() -> callable:
 zoom_headers = make_zoom_headers()
 
 
+@functools.lru_cache()
 def vsf_repo():
     gh = github.Github(os.getenv("VSF_BOT_TOKEN"))
     return gh.get_repo("virtualscienceforum/virtualscienceforum")
 
 
-def talks_data(ref="master", repo=None):
-    if repo is None:
-        repo = vsf_repo()
+def cached_contents(repo, path: str, ref: str, parse: callable) -> tuple:
+    """Fetch a file from a GitHub repository and parse it, caching the result.
+
+    The file is requested conditionally using the ETag of the previous
+    response, and the parsed data is stored in ``CACHE_DIR`` keyed by the blob
+    SHA, so that an unchanged file costs a single 304 response and no parsing.
+
+    repo : github.Repository.Repository
+    path : str
+        Path of the file in the repository.
+    ref : str
+        Branch, tag or commit to read the file from.
+    parse : callable
+        Function converting the file text into data. Its name is a part of
+        the cache key, so it must be renamed if its output changes.
+
+    Returns the parsed data and the blob SHA of the file.
+    """
+    cache = CACHE_DIR / "github"
+    location = hashlib.sha256(f"{repo.full_name}:{ref}:{path}".encode()).hexdigest()
+    index_file = cache / f"{location}.json"
+    try:
+        index = json.loads(index_file.read_text())
+    except (OSError, ValueError):
+        index = {}
 
-    # Read the talks file
-    talks_data = repo.get_contents(TALKS_FILE, ref=ref)
-    talks = yaml.load(StringIO(talks_data.decoded_content.decode()))
+    def load_parsed(sha):
+        try:
+            with open(cache / f"{sha}.{parse.__name__}.pickle", "rb") as f:
+                return pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
+
+    url = f"{repo.url}/contents/{path}"
+    headers, data = repo.requester.requestJsonAndCheck(
+        "GET",
+        url,
+        parameters={"ref": ref},
+        headers=({"If-None-Match": index["etag"]} if "etag" in index else None),
+    )
+    if data is None:  # 304 Not Modified
+        sha = index["sha"]
+        if (parsed := load_parsed(sha)) is not None:
+            logging.info(f"Using cached {path} at {sha}.")
+            return parsed, sha
+        # The cached data got lost, make an unconditional request.
+        headers, data = repo.requester.requestJsonAndCheck(
+            "GET", url, parameters={"ref": ref}
+        )
+
+    sha = data["sha"]
+    if (parsed := load_parsed(sha)) is None:
+        if data.get("encoding") == "base64":
+            content = data["content"]
+        else:
+            # Files over 1 MB are only available through the blobs API.
+            content = repo.get_git_blob(sha).content
+        parsed = parse(base64.b64decode(content).decode())
+        atomic_write(
+            cache / f"{sha}.{parse.__name__}.pickle",
+            pickle.dumps(parsed, protocol=pickle.HIGHEST_PROTOCOL),
+        )
+
+    if index.get("sha") not in (None, sha):
+        # Keep the cache from growing with every revision of the file.
+        (cache / f"{index['sha']}.{parse.__name__}.pickle").unlink(missing_ok=True)
+
+    headers = {key.lower(): value for key, value in headers.items()}
+    if "etag" in headers:
+        atomic_write(
+            index_file, json.dumps({"etag": headers["etag"], "sha": sha}).encode()
+        )
+    return parsed, sha
+
+
+def parse_talks(text: str) -> list:
+    """Parse the talks file preserving comments and formatting."""
+    talks = yaml.load(StringIO(text))
     for talk in talks:
         # Workaround against issues
         # https://sourceforge.net/p/ruamel-yaml/tickets/365/
@@ -112,12 +343,607 @@ def talks_data(ref="master", repo=None):
                 .timestamp(),
             tz=datetime.timezone.utc
         )
-    return talks, talks_data.sha
+    return talks
+
+
+def as_utc(time: datetime.datetime) -> datetime.datetime:
+    """Convert a time to UTC, treating naive times as UTC."""
+    if time.tzinfo is None:
+        return time.replace(tzinfo=datetime.timezone.utc)
+    return time.astimezone(datetime.timezone.utc)
+
+
+def parse_talks_readonly(text: str) -> list:
+    """Parse the talks file into plain dictionaries with UTC-aware times."""
+    talks = pyyaml.load(text, Loader=FastLoader)
+    for talk in talks:
+        talk["time"] = as_utc(talk["time"])
+    return talks
+
+
+class Talk(collections.abc.MutableMapping):
+    """A compact talk record that behaves like a talk dictionary.
+
+    The fields are stored in slots instead of a per-talk dictionary, and long
+    text fields are kept compressed and only decoded when accessed. The order
+    of the keys is preserved, so that ``to_dict`` returns the talk exactly as
+    it appeared in the talks file. Fields are also available as attributes.
+    """
+
+    FIELDS = (
+        "time", "event_type", "title", "speaker_name", "speaker_affiliation",
+        "email", "preprint", "workflow_issue", "zoom_meeting_id",
+        "registration_url", "youtube_id",
+    )
+    LAZY_FIELDS = ("abstract", "authors")
+    __slots__ = FIELDS + tuple(f"_{field}" for field in LAZY_FIELDS) + ("_keys", "_extra")
+
+    time: datetime.datetime
+    event_type: str
+    title: str
+    speaker_name: str
+    speaker_affiliation: str
+    email: str
+    preprint: str
+    workflow_issue: int
+    zoom_meeting_id: int
+    registration_url: str
+    youtube_id: str
+
+    # Talks share the tuples with the order of their keys.
+    _key_orders = {}
+
+    def __init__(self, data=()):
+        self._keys = ()
+        self._extra = None
+        self.update(data)
+
+    def __getitem__(self, key):
+        if key not in self._keys:
+            raise KeyError(key)
+        if key in self.LAZY_FIELDS:
+            value = getattr(self, f"_{key}")
+            return zlib.decompress(value).decode() if isinstance(value, bytes) else value
+        if key in self.FIELDS:
+            return getattr(self, key)
+        return self._extra[key]
+
+    def __setitem__(self, key, value):
+        if key in self.LAZY_FIELDS:
+            if isinstance(value, str) and len(value) > 100:
+                value = zlib.compress(value.encode())
+            setattr(self, f"_{key}", value)
+        elif key in self.FIELDS:
+            setattr(self, key, value)
+        else:
+            if self._extra is None:
+                self._extra = {}
+            self._extra[key] = value
+
+        if key not in self._keys:
+            self._set_keys(self._keys + (key,))
+
+    def __delitem__(self, key):
+        if key not in self._keys:
+            raise KeyError(key)
+        if key in self.LAZY_FIELDS:
+            delattr(self, f"_{key}")
+        elif key in self.FIELDS:
+            delattr(self, key)
+        else:
+            del self._extra[key]
+        self._set_keys(tuple(k for k in self._keys if k != key))
+
+    def _set_keys(self, keys):
+        self._keys = self._key_orders.setdefault(keys, keys)
+
+    def __contains__(self, key):
+        return key in self._keys
+
+    def __iter__(self):
+        return iter(self._keys)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __getattr__(self, name):
+        # Only called for the lazy fields, the other fields are slots.
+        if name in self.LAZY_FIELDS and name in self._keys:
+            return self[name]
+        raise AttributeError(name)
+
+    def __setstate__(self, state):
+        # Pickled talks must share the key orders again.
+        _, slots = state
+        for name, value in slots.items():
+            setattr(self, name, value)
+        self._set_keys(self._keys)
+
+    def __repr__(self):
+        return f"Talk({self.to_dict()!r})"
+
+    def to_dict(self) -> dict:
+        """Return the talk as a dictionary with the keys in the original order."""
+        return {key: self[key] for key in self._keys}
+
+
+def parse_talk_records(text: str) -> "TalkCatalog":
+    """Parse the talks file into a catalog of compact ``Talk`` records."""
+    return TalkCatalog([Talk(talk) for talk in parse_talks_readonly(text)])
+
+
+def parse_archive_manifest(text: str) -> dict:
+    manifest = pyyaml.load(text, Loader=FastLoader)
+    for shard in manifest["shards"]:
+        shard["first"], shard["last"] = as_utc(shard["first"]), as_utc(shard["last"])
+    return manifest
+
+
+def archive_shards(ref="master", repo=None, since=None) -> Iterator["TalkCatalog"]:
+    """Iterate over the archived talks shard by shard, newest shards first.
+
+    since : datetime, optional
+        Skip the shards where all talks are older than this.
+    """
+    if repo is None:
+        repo = vsf_repo()
+
+    try:
+        manifest, _ = cached_contents(repo, ARCHIVE_MANIFEST, ref, parse_archive_manifest)
+    except github.UnknownObjectException:
+        # Nothing is archived yet.
+        return
+
+    for shard in sorted(manifest["shards"], key=operator.itemgetter("last"), reverse=True):
+        if since is not None and shard["last"] < since:
+            break
+        yield cached_contents(repo, shard["path"], ref, parse_talk_records)[0]
+
+
+def read_talks(ref="master", repo=None, since=None) -> "TalkCatalog":
+    """Load the talks for read-only use.
+
+    The talks are ``Talk`` records that do not preserve the formatting of the
+    talks file, changes are written back with ``commit_talks`` instead. They
+    are returned as a ``TalkCatalog``, which is cached together with its
+    indexes.
+
+    since : datetime, optional
+        Only archived talks after this time are needed. The talks file only
+        holds upcoming and recent talks, the older ones are archived in yearly
+        shards, which are skipped if all their talks are older.
+    """
+    if repo is None:
+        repo = vsf_repo()
+
+    talks, _ = cached_contents(repo, TALKS_FILE, ref, parse_talk_records)
+    if not (shards := list(archive_shards(ref, repo, since))):
+        return talks
+    return TalkCatalog(itertools.chain(talks, *shards))
+
+
+class TalkCatalog:
+    """Talks indexed by time and by their identifiers.
+
+    Supports fast queries of time windows and lookups of a talk by any of the
+    ``INDEXED_FIELDS``. Talks must be modified through ``update`` to keep the
+    indexes consistent.
+
+    talks : iterable of dict
+        Talks as returned by ``read_talks`` or ``parse_talks``. A list is used
+        as is, so that the catalog modifies the talks in place.
+    event_type : str, optional
+        Only include talks of this type.
+    """
+
+    INDEXED_FIELDS = ("workflow_issue", "zoom_meeting_id", "youtube_id")
+
+    def __init__(self, talks, event_type=None):
+        if event_type is not None:
+            talks = [talk for talk in talks if talk["event_type"] == event_type]
+        self.talks = talks if isinstance(talks, list) else list(talks)
+        self._by_time = sorted(self.talks, key=operator.itemgetter("time"))
+        self._times = [talk["time"] for talk in self._by_time]
+        self._indexes = {field: {} for field in self.INDEXED_FIELDS}
+        for talk in self.talks:
+            self._index(talk)
+
+    def __len__(self):
+        return len(self.talks)
+
+    def __iter__(self):
+        return iter(self.talks)
+
+    def _index(self, talk):
+        for field, index in self._indexes.items():
+            if field in talk:
+                index[talk[field]] = talk
+
+    def _unindex(self, talk):
+        for field, index in self._indexes.items():
+            if field in talk and index.get(talk[field]) is talk:
+                del index[talk[field]]
+
+    def between(self, start: datetime.datetime, end: datetime.datetime) -> list:
+        """Return the talks with ``start <= time < end`` sorted by time."""
+        return self._by_time[
+            bisect.bisect_left(self._times, start):bisect.bisect_left(self._times, end)
+        ]
+
+    def get(self, field: str, value, default=None):
+        """Return the talk with ``talk[field] == value``, or ``default``."""
+        return self._indexes[field].get(value, default)
+
+    def update(self, field: str, value, changes: dict):
+        """Modify the talk with ``talk[field] == value`` in place.
+
+        field, value :
+            Identify the talk to update, ``KeyError`` is raised if none matches.
+        changes : dict
+            New values of the talk fields, with ``None`` removing a field. The
+            time can be changed but not removed, ``ValueError`` is raised.
+
+        Returns the updated talk.
+        """
+        if "time" in changes and changes["time"] is None:
+            raise ValueError("Cannot remove the time of a talk.")
+        talk = self._indexes[field][value]
+        self._unindex(talk)
+        if "time" in changes:
+            position = bisect.bisect_left(self._times, talk["time"])
+            while self._by_time[position] is not talk:
+                position += 1
+            del self._by_time[position], self._times[position]
+
+        for key, new_value in changes.items():
+            if new_value is None:
+                talk.pop(key, None)
+            else:
+                talk[key] = new_value
+
+        if "time" in changes:
+            position = bisect.bisect_right(self._times, talk["time"])
+            self._by_time.insert(position, talk)
+            self._times.insert(position, talk["time"])
+        self._index(talk)
+        return talk
+
+
+def _dump_field(key, value, indent: int) -> str:
+    """Serialize a single talk field as it appears inside a talk."""
+    serialized = StringIO()
+    field_yaml.dump({key: value}, serialized)
+    return serialized.getvalue().rstrip("\n").replace("\n", "\n" + " " * indent)
+
+
+def patch_talks(text: str, changes: dict) -> tuple:
+    """Apply field changes to the talks file, leaving everything else intact.
+
+    Only the text of the changed fields is replaced, so that comments,
+    formatting and all other talks stay byte for byte the same.
+
+    text : str
+        Contents of the talks file.
+    changes : dict
+        Maps the ``workflow_issue`` of a talk to a dictionary with the new
+        values of its fields, with ``None`` removing a field.
+
+    Returns the new text and the set of the ``workflow_issue`` of the talks
+    that were found.
+    """
+    def value_end(node):
+        # Leave the trailing whitespace and comments in place.
+        end = node.end_mark.index
+        while text[end - 1].isspace():
+            end -= 1
+        return end
+
+    def line_end(node):
+        # After the inline comment of a value, before the line break.
+        end = text.find("\n", value_end(node))
+        return len(text) if end == -1 else end
+
+    edits = []  # (start, end, replacement)
+    applied = set()
+    for item in pyyaml.compose(text, Loader=FastLoader).value:
+        fields = {key.value: (key, value) for key, value in item.value}
+        if "workflow_issue" not in fields:
+            continue
+        workflow_issue = int(fields["workflow_issue"][1].value)
+        if (talk_changes := changes.get(workflow_issue)) is None:
+            continue
+        if item.flow_style:
+            raise ValueError(f"Cannot patch the talk from {workflow_issue} in flow style.")
+        applied.add(workflow_issue)
+        indent = item.value[0][0].start_mark.column
+
+        nodes = list(item.value)
+        removed = [talk_changes.get(key.value, ...) is None for key, _ in nodes]
+        if all(removed):
+            raise ValueError(f"Cannot remove all fields of the talk from {workflow_issue}.")
+        for i, (key, value) in enumerate(nodes):
+            if removed[i] or key.value not in talk_changes:
+                continue
+            replacement = _dump_field(key.value, talk_changes[key.value], indent)
+            if text[key.start_mark.index:value_end(value)] != replacement:
+                edits.append((key.start_mark.index, value_end(value), replacement))
+
+        added = "".join(
+            "\n" + " " * indent + _dump_field(key, value, indent)
+            for key, value in talk_changes.items()
+            if value is not None and key not in fields
+        )
+        if added:
+            last_kept = max(i for i, is_removed in enumerate(removed) if not is_removed)
+            end = line_end(nodes[last_kept][1])
+            edits.append((end, end, added))
+        # Remove the lines of runs of consecutive fields together, so that the
+        # edits don't overlap. Comments on lines of their own stay in place.
+        i = 0
+        while i < len(nodes):
+            if not removed[i]:
+                i += 1
+                continue
+            run_end = i
+            while run_end + 1 < len(nodes) and removed[run_end + 1]:
+                run_end += 1
+            start = nodes[i][0].start_mark.index
+            end = line_end(nodes[run_end][1])
+            if i == 0:
+                # Keep the "- " of the talk, the next line moves up to it.
+                end += 1 + indent
+            elif end == len(text):
+                # The end of a file without a final line break.
+                start = text.rfind("\n", 0, start)
+            else:
+                start, end = text.rfind("\n", 0, start) + 1, end + 1
+            edits.append((start, end, ""))
+            i = run_end + 1
+
+    for start, end, replacement in sorted(edits, reverse=True):
+        text = text[:start] + replacement + text[end:]
+    return text, applied
+
+
+def commit_talks(
+    repo, changes: dict, message: str, branch="master", attempts=8
+) -> set:
+    """Commit field changes of talks to the talks file, see ``patch_talks``.
+
+    The changes are applied to the latest version of the talks file. If
+    somebody else pushes in the meantime, the file is fetched again and the
+    changes are applied anew, retrying up to ``attempts`` times with backoff.
+
+    Returns the set of the ``workflow_issue`` of the updated talks.
+    """
+    for attempt in range(attempts):
+        contents = repo.get_contents(TALKS_FILE, ref=branch)
+        old_text = contents.decoded_content.decode()
+        text, applied = patch_talks(old_text, changes)
+        if text == old_text:
+            # Nothing to do, e.g. a previous attempt went through after all.
+            return applied
+        try:
+            repo.update_file(TALKS_FILE, message, text, sha=contents.sha, branch=branch)
+            return applied
+        except github.GithubException as e:
+            # 409 means that the file changed since we fetched it.
+            if e.status != 409 or attempt == attempts - 1:
+                raise
+            delay = min(2**attempt, 60) * (0.5 + random.random())
+            logging.info(f"{TALKS_FILE} changed while committing, retrying in {delay:.1f} s.")
+            sleep(delay)
+
+
+class TalkChangeQueue:
+    """Talk field changes to be committed to the talks file together.
+
+    The queue is stored in ``path``, so that changes queued by several jobs,
+    or left over by a job that failed to commit, go into a single commit.
+
+    path : pathlib.Path
+        File storing the queued changes.
+    """
+
+    def __init__(self, path=CACHE_DIR / "talk_changes.json"):
+        self.path = Path(path)
+
+    @contextlib.contextmanager
+    def _locked(self):
+        """Lock the queue and yield the queued changes for modification."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path.with_suffix(".lock"), "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                queued = json.loads(self.path.read_text())
+            except (OSError, ValueError):
+                queued = {}
+            yield queued
+            atomic_write(self.path, json.dumps(queued, indent=2).encode())
+
+    def add(self, workflow_issue: int, changes: dict, description: str):
+        """Queue changes of a talk, see ``patch_talks``.
+
+        description : str
+            Summary of the changes for the commit message.
+        """
+        with self._locked() as queued:
+            entry = queued.setdefault(str(workflow_issue), {"changes": {}, "descriptions": []})
+            entry["changes"].update(changes)
+            entry["descriptions"].append(description)
+
+    def queued(self) -> dict:
+        """Return the queued changes by ``workflow_issue``."""
+        with self._locked() as queued:
+            return {int(issue): entry["changes"] for issue, entry in queued.items()}
+
+    @staticmethod
+    def _commit(repo, queued: dict, branch: str) -> set:
+        descriptions = [
+            description
+            for entry in queued.values()
+            for description in entry["descriptions"]
+        ]
+        message = (
+            descriptions[0] if len(descriptions) == 1
+            else f"update {len(queued)} talks\n\n"
+            + "\n".join(f"- {description}" for description in descriptions)
+        )
+        return commit_talks(
+            repo,
+            {int(issue): entry["changes"] for issue, entry in queued.items()},
+            message,
+            branch=branch,
+        )
+
+    def flush(self, repo, branch="master") -> dict:
+        """Commit all queued changes in a single commit.
+
+        Returns a dictionary mapping the ``workflow_issue`` of each queued talk
+        to whether it was updated. The changes of talks missing from the talks
+        file stay queued, as do all changes if the commit fails. Changes that
+        ``patch_talks`` rejects are reported and dropped, so that they don't
+        block the others.
+        """
+        with self._locked() as queued:
+            if not queued:
+                return {}
+            issues = [int(issue) for issue in queued]
+            rejected = {}
+            try:
+                applied = self._commit(repo, queued, branch)
+            except ValueError:
+                text = repo.get_contents(TALKS_FILE, ref=branch).decoded_content.decode()
+                for issue, entry in list(queued.items()):
+                    try:
+                        patch_talks(text, {int(issue): entry["changes"]})
+                    except ValueError as e:
+                        rejected[int(issue)] = e
+                        del queued[issue]
+                if not rejected:
+                    raise
+                applied = self._commit(repo, queued, branch) if queued else set()
+            result = {issue: issue in applied for issue in issues}
+            for issue in applied:
+                del queued[str(issue)]
+
+        for issue, success in result.items():
+            if issue in rejected:
+                logging.error(f"Dropping the changes of the talk from {issue}: {rejected[issue]}")
+            elif not success:
+                logging.error(f"Talk from {issue} not found in {TALKS_FILE}, keeping its changes.")
+        return result
+
+
+class TokenBucket:
+    """A thread-safe token bucket limiting the rate of requests.
+
+    rate : float
+        Requests per second.
+    capacity : float, optional
+        Size of a burst of requests, by default one second worth of requests.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(rate, 1)
+        self.tokens = self.capacity
+        self.updated = monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self):
+        """Wait until a request is allowed."""
+        with self.lock:
+            self._refill()
+            # A negative balance reserves a token for this caller.
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0
+        sleep(wait)
+
+    def pause(self, seconds):
+        """Allow no requests for the next ``seconds``."""
+        with self.lock:
+            self._refill()
+            self.tokens = min(self.tokens, -seconds * self.rate)
+
+
+zoom_rate_limits = {
+    category: TokenBucket(rate) for category, rate in ZOOM_RATE_LIMITS.items()
+}
+# Rate limit categories reported by Zoom, supplementing ZOOM_RATE_CATEGORIES.
+zoom_observed_categories = {}
+
+
+def zoom_endpoint(method: str, url: str) -> tuple:
+    """Identify the Zoom API endpoint of a request, e.g. ``("GET", "meetings/{id}")``."""
+    path = url[len(ZOOM_API):] if url.startswith(ZOOM_API) else url
+    return method.upper(), "/".join(
+        segment if re.fullmatch(r"[a-z_]+", segment) else "{id}"
+        for segment in path.split("?")[0].split("/") if segment
+    )
+
+
+def retry_after(response) -> float:
+    """Return the number of seconds to wait according to the response headers.
+
+    Returns ``None`` if the response has no ``Retry-After`` header, or if it
+    can't be parsed.
+    """
+    value = response.headers.get("Retry-After")
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        until = datetime.datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        try:
+            until = email.utils.parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            # Older Pythons raise TypeError.
+            logging.warning(f"Ignoring the invalid Retry-After header {value!r}.")
+            return None
+    return (as_utc(until) - datetime.datetime.now(tz=datetime.timezone.utc)).total_seconds()
 
 
 def zoom_request(method: callable, *args, **kwargs):
-    """A minimal wrapper around requests for querying zoom API with error handling"""
-    response = method(*args, **kwargs, headers=zoom_headers())
+    """A minimal wrapper around requests for querying zoom API with error handling
+
+    Requests are throttled per rate limit category of the endpoint. Throttled
+    requests are retried with jittered exponential backoff, or after the
+    ``Retry-After`` time if it is shorter than ``ZOOM_MAX_RETRY_WAIT``.
+    """
+    endpoint = zoom_endpoint(method.__name__, args[0] if args else kwargs["url"])
+    for attempt in range(ZOOM_MAX_RETRIES + 1):
+        category = zoom_observed_categories.get(
+            endpoint, ZOOM_RATE_CATEGORIES.get(endpoint, "Light")
+        )
+        zoom_rate_limits[category].acquire()
+        response = method(*args, **kwargs, headers=zoom_headers())
+        if response.headers.get("X-RateLimit-Category") in zoom_rate_limits:
+            zoom_observed_categories[endpoint] = response.headers["X-RateLimit-Category"]
+        if response.status_code != 429 or attempt == ZOOM_MAX_RETRIES:
+            break
+
+        if (delay := retry_after(response)) is None:
+            delay = min(2**attempt, ZOOM_MAX_RETRY_WAIT) * random.uniform(0.5, 1.5)
+        if delay > ZOOM_MAX_RETRY_WAIT:
+            # Most likely a daily limit, no point in waiting.
+            break
+        logging.warning(
+            f"Zoom throttled {' '.join(endpoint)} "
+            f"({response.headers.get('X-RateLimit-Type', 'unknown limit')}), "
+            f"retrying in {delay:.1f} s."
+        )
+        zoom_rate_limits[category].pause(delay)
+
     response.raise_for_status()
 
     if response.content:
@@ -125,7 +951,7 @@ def zoom_request(method: callable, *args, **kwargs):
 
 
 def speakers_corner_user_id() -> str:
-    users = zoom_request(requests.get, ZOOM_API + "users")["users"]
+    users = zoom_request(session.get, ZOOM_API + "users")["users"]
     sc_user_id = next(
         u["id"] for u in users
         if u["first_name"] == "Speakers'" and u["last_name"] == "Corner"
@@ -133,36 +959,65 @@ def speakers_corner_user_id() -> str:
     return sc_user_id
 
 
-def all_meetings(user_id) -> list:
-    """Return all meetings by a user.
+def paginate(url: str, key: str, params=None, page_size=ZOOM_MAX_PAGE_SIZE) -> Iterator[dict]:
+    """Iterate over all records returned by a paginated Zoom list endpoint.
+
+    The next page is requested in the background while the caller consumes the
+    records of the current one.
 
-    Handles pagination, and adds ``live: True`` to a meeting that is running (if any).
+    url : str
+        Endpoint URL.
+    key : str
+        Response field containing the list of records, e.g. ``"meetings"``.
+    params : dict, optional
+        Additional query parameters.
+    page_size : int
+        Number of records per page, Zoom's maximum by default.
     """
-    meetings = []
-    next_page_token = ""
-    while True:
-        meetings_page = zoom_request(
-            requests.get,
-            f"{ZOOM_API}users/{user_id}/meetings",
-            params={"type": "scheduled", "page_size": 300, "next_page_token": next_page_token}
+    params = {**(params or {}), "page_size": page_size}
+
+    def fetch(next_page_token):
+        return zoom_request(
+            session.get,
+            url,
+            params={**params, "next_page_token": next_page_token},
         )
-        meetings += meetings_page["meetings"]
-        next_page_token = meetings_page["next_page_token"]
-        if not next_page_token:
-            break
 
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        page = executor.submit(fetch, "")
+        try:
+            while page is not None:
+                response = page.result()
+                next_page_token = response.get("next_page_token")
+                page = (
+                    executor.submit(fetch, next_page_token) if next_page_token
+                    else None
+                )
+                yield from response[key]
+        finally:
+            # The caller stopped early, don't wait for a page nobody needs.
+            if page is not None:
+                page.cancel()
+
+
+def all_meetings(user_id) -> Iterator[dict]:
+    """Iterate over all meetings by a user.
+
+    Adds ``live: True`` to a meeting that is running (if any).
+    """
     live_meetings = zoom_request(
-        requests.get,
+        session.get,
         f"{ZOOM_API}users/{user_id}/meetings",
-        params={"type": "live", "page_size": 300}
+        params={"type": "live", "page_size": ZOOM_MAX_PAGE_SIZE}
     )["meetings"]
+    live_id = live_meetings[0]["id"] if live_meetings else None
 
-    if live_meetings:
-        for meeting in meetings:
-            if meeting["id"] == live_meetings[0]["id"]:
-                meeting["live"] = True
-
-    return meetings
+    for meeting in paginate(
+        f"{ZOOM_API}users/{user_id}/meetings", "meetings", {"type": "scheduled"}
+    ):
+        if meeting["id"] == live_id:
+            meeting["live"] = True
+        yield meeting
 
 
 def api_query(method, endpoint, **params):
@@ -183,8 +1038,103 @@ def api_query(method, endpoint, **params):
     return result
 
 
+def mailing_list_members(address: str) -> Iterator[dict]:
+    """Iterate over all members of a Mailgun mailing list, including unsubscribed."""
+    endpoint = f"lists/{address}/members/pages"
+    params = {"limit": 100}
+    while True:
+        page = api_query(session.get, endpoint, params=params)
+        if not page["items"]:
+            return
+        yield from page["items"]
+        endpoint, params = page["paging"]["next"][len(MAILGUN_BASE_URL):], None
+
+
+def sync_mailing_list(address: str, members) -> int:
+    """Add the members that are not on a Mailgun mailing list yet.
+
+    The addresses on the list are kept in a snapshot in ``CACHE_DIR``, which is
+    refreshed from Mailgun when older than ``MAILING_LIST_SNAPSHOT_MAX_AGE``.
+    Only the new addresses are uploaded, in batches Mailgun accepts.
+
+    address : str
+        Address of the mailing list.
+    members : iterable of dict
+        Members with ``address`` and ``name`` keys.
+
+    Returns the number of added members.
+    """
+    path = CACHE_DIR / "mailing_lists" / f"{address}.json"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    now = datetime.datetime.now(tz=datetime.timezone.utc)
+    with open(path.with_suffix(".lock"), "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            snapshot = json.loads(path.read_text())
+            updated = datetime.datetime.fromisoformat(snapshot["updated"])
+            known = set(snapshot["addresses"])
+        except (OSError, ValueError, KeyError):
+            updated, known = None, set()
+
+        if updated is None or now - updated > MAILING_LIST_SNAPSHOT_MAX_AGE:
+            logging.info(f"Refreshing the members of {address}.")
+            known = {member["address"].lower() for member in mailing_list_members(address)}
+            updated = now
+
+        def save():
+            atomic_write(path, json.dumps(
+                {"updated": updated.isoformat(), "addresses": sorted(known)}
+            ).encode())
+
+        new_members = {}
+        for member in members:
+            if (key := member["address"].lower()) not in known:
+                new_members.setdefault(key, member)
+
+        new_members = list(new_members.items())
+        for start in range(0, len(new_members), MAILGUN_MEMBERS_BATCH_SIZE):
+            batch = new_members[start:start + MAILGUN_MEMBERS_BATCH_SIZE]
+            api_query(
+                session.post,
+                f"lists/{address}/members.json",
+                data={"members": json.dumps([member for _, member in batch]), "upsert": "no"},
+            )
+            known.update(key for key, _ in batch)
+            save()
+        save()
+
+    return len(new_members)
+
+
+_template_sources = {}
+# Templates are named by the hash of their source, so that the bytecode
+# cached by earlier runs is reused as long as the source is unchanged.
+templates = jinja2.Environment(
+    loader=jinja2.FunctionLoader(_template_sources.get),
+    bytecode_cache=jinja2.FileSystemBytecodeCache(str(CACHE_DIR / "jinja")),
+)
+
+
+def template(source: str) -> jinja2.Template:
+    """Compile a template, or load it from the bytecode cache."""
+    name = hashlib.sha256(source.encode()).hexdigest()
+    _template_sources[name] = source
+    (CACHE_DIR / "jinja").mkdir(parents=True, exist_ok=True)
+    return templates.get_template(name)
+
+
+_markdown = threading.local()
+
+
+def markdown_to_html(text: str) -> str:
+    """Convert markdown with a Markdown instance reused within the thread."""
+    if (converter := getattr(_markdown, "converter", None)) is None:
+        converter = _markdown.converter = markdown.Markdown()
+    return converter.reset().convert(text)
+
+
 def markdown_to_email(text: str) -> str:
-    html = markdown.markdown(text)
+    html = markdown_to_html(text)
     return (
         '<table cellspacing="0" cellpadding="0" border="0"><tr>'
         '<td style="word-break:normal;border-collapse:collapse!important;max-width:600px">'
@@ -196,32 +1146,249 @@ def markdown_to_plain(text: str) -> str:
     return text.replace('[', '').replace(']', ' ').replace('  \n', '\n').replace('*', '')
 
 
-def meeting_registrants(zoom_meeting_id: int) -> dict:
-    registrants = []
-    next_page_token = ""
-    while True:
-        response = requests.get(
-            f"https://api.zoom.us/v2/meetings/{zoom_meeting_id}/registrants",
-            headers=zoom_headers(),
-            params={"next_page_token": next_page_token}
-        )
+def email_bodies(text: str) -> dict:
+    """Return the plain text and html bodies of a markdown email."""
+    return {"text": markdown_to_plain(text), "html": markdown_to_email(text)}
+
 
+def render_email(template: jinja2.Template, **variables) -> dict:
+    """Render a markdown email template into its plain text and html bodies."""
+    return email_bodies(template.render(**variables))
+
+
+def meeting_registrants(zoom_meeting_id: int) -> Iterator[dict]:
+    """Iterate over the registrants of a meeting, with custom questions as keys.
+
+    Yields nothing if registration is not enabled for the meeting.
+    """
+    try:
+        for registrant in paginate(
+            f"{ZOOM_API}meetings/{zoom_meeting_id}/registrants", "registrants"
+        ):
+            yield {
+                **registrant,
+                **{q["title"]: q["value"] for q in registrant.pop("custom_questions")}
+            }
+    except requests.HTTPError as e:
         # Registration was not enabled for this meeting
-        if response.status_code == 400:
-            return []
+        if e.response.status_code != 400:
+            raise
 
-        response = response.json()
-        registrants += response["registrants"]
-        next_page_token = response["next_page_token"]
-        if not next_page_token:
-            break
 
-    registrants = [
-        {**i, **{q["title"]: q["value"] for q in i.pop("custom_questions")}}
-        for i in registrants
-    ]
+class Outbox:
+    """A durable queue of outgoing Mailgun messages.
+
+    Every message has an idempotency key, and queueing a message with a key
+    that was queued before does nothing. Re-running a job therefore neither
+    drops nor duplicates its emails, as long as ``CACHE_DIR`` is kept.
+    Messages that fail ``OUTBOX_MAX_ATTEMPTS`` times are marked as failed and
+    no longer sent.
+
+    path : pathlib.Path
+        SQLite database storing the messages.
+    """
+
+    def __init__(self, path=CACHE_DIR / "outbox.sqlite"):
+        self.path = Path(path)
+        self._connection = None
+        self._lock = threading.Lock()
+
+    @property
+    def connection(self):
+        if self._connection is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._connection = sqlite3.connect(
+                self.path, timeout=60, check_same_thread=False, isolation_level=None
+            )
+            self._connection.execute("""CREATE TABLE IF NOT EXISTS messages (
+                key TEXT PRIMARY KEY,
+                data TEXT NOT NULL,
+                recipients TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                error TEXT,
+                created REAL NOT NULL,
+                sent REAL
+            )""")
+        return self._connection
+
+    def _execute(self, query, parameters=()) -> list:
+        with self._lock:
+            return self.connection.execute(query, parameters).fetchall()
+
+    def enqueue(self, key: str, data: dict, recipients=()) -> bool:
+        """Queue a message unless a message with the same key was queued.
+
+        key : str
+            Idempotency key, e.g. made of the talk, the template and the date.
+        data : dict
+            Parameters of the Mailgun messages API.
+        recipients : list of str, optional
+            Addresses of a batch message, see ``queued_recipients``.
+
+        Returns whether the message was queued.
+        """
+        with self._lock:
+            return self.connection.execute(
+                "INSERT OR IGNORE INTO messages (key, data, recipients, created) "
+                "VALUES (?, ?, ?, ?)",
+                (key, json.dumps(data), json.dumps(list(recipients)), time()),
+            ).rowcount == 1
 
-    return registrants
+    def queued_recipients(self, prefix: str) -> set:
+        """Return the recipients of all messages whose key starts with ``prefix``."""
+        rows = self._execute(
+            "SELECT recipients FROM messages WHERE substr(key, 1, ?) = ?",
+            (len(prefix), prefix),
+        )
+        return {address for row in rows for address in json.loads(row[0])}
+
+    def unsent(self, key: str, prefix=False) -> dict:
+        """Return the errors of the messages with ``key`` that were not sent.
+
+        If ``prefix`` is true, include all messages whose key starts with ``key``.
+        """
+        if prefix:
+            query, parameters = "substr(key, 1, ?) = ?", (len(key), key)
+        else:
+            query, parameters = "key = ?", (key,)
+        return dict(self._execute(
+            f"SELECT key, error FROM messages WHERE status != 'sent' AND {query}",
+            parameters,
+        ))
+
+    def _send(self, key, data, attempts):
+        for attempt in range(attempts, min(attempts + OUTBOX_ATTEMPTS, OUTBOX_MAX_ATTEMPTS)):
+            try:
+                response = api_query(session.post, MAILGUN_DOMAIN + "messages", data=data)
+                break
+            except (RuntimeError, requests.RequestException) as e:
+                failed = attempt + 1 == OUTBOX_MAX_ATTEMPTS
+                self._execute(
+                    "UPDATE messages SET attempts = attempts + 1, error = ?, status = ? "
+                    "WHERE key = ?",
+                    (str(e), "failed" if failed else "pending", key),
+                )
+                if failed:
+                    logging.error(f"Giving up on message {key} after {attempt + 1} attempts.")
+                if attempt + 1 == min(attempts + OUTBOX_ATTEMPTS, OUTBOX_MAX_ATTEMPTS):
+                    raise
+                sleep(2**(attempt - attempts))
+
+        self._execute(
+            "UPDATE messages SET status = 'sent', sent = ?, error = NULL WHERE key = ?",
+            (time(), key),
+        )
+        return response
+
+    def flush(self, workers=MAILGUN_WORKERS) -> dict:
+        """Send all pending messages, at most ``workers`` at a time.
+
+        Failed messages are retried ``OUTBOX_ATTEMPTS`` times and stay pending
+        for the next flush, until they fail ``OUTBOX_MAX_ATTEMPTS`` times.
+        Returns the Mailgun responses by message key. Errors are logged, see
+        ``unsent`` to check whether a particular message was sent.
+        """
+        lock_path = self.path.with_suffix(".lock")
+        lock_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(lock_path, "w") as lock_file:
+            # Another process may be sending the same messages.
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            pending = self._execute(
+                "SELECT key, data, attempts FROM messages WHERE status = 'pending' "
+                "ORDER BY created"
+            )
+            responses = {}
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                sends = {
+                    executor.submit(self._send, key, json.loads(data), attempts): key
+                    for key, data, attempts in pending
+                }
+                for future in futures.as_completed(sends):
+                    try:
+                        responses[sends[future]] = future.result()
+                    except (RuntimeError, requests.RequestException) as e:
+                        logging.warning(f"Sending message {sends[future]} failed: {e}")
+
+            # Keep the outbox small, but remember recent messages.
+            self._execute(
+                "DELETE FROM messages WHERE status != 'pending' AND coalesce(sent, created) < ?",
+                (time() - OUTBOX_RETENTION.total_seconds(),),
+            )
+
+        return responses
+
+
+outbox = Outbox()
+
+
+def send_message(key: str, data: dict) -> dict:
+    """Send a Mailgun message through the outbox, unless it was sent already.
+
+    key : str
+        Idempotency key, see ``Outbox.enqueue``.
+    data : dict
+        Parameters of the Mailgun messages API.
+
+    Returns the responses of all messages sent from the outbox. Raises
+    ``RuntimeError`` if this message could not be sent.
+    """
+    if not outbox.enqueue(key, data):
+        logging.info(f"Message {key} was already queued.")
+    responses = outbox.flush()
+    if errors := outbox.unsent(key):
+        raise RuntimeError(errors)
+    return responses
+
+
+def send_batch(
+    key: str,
+    data: dict,
+    recipients,
+    batch_size=MAILGUN_BATCH_SIZE,
+) -> dict:
+    """Send a message to many recipients with Mailgun batch sending.
+
+    The recipients are split into batches that Mailgun accepts, each sent as a
+    separate message with only its own recipient variables. The batches go
+    through the outbox, and recipients that were already queued under the
+    same ``key`` are skipped.
+
+    key : str
+        Idempotency key of the message, see ``Outbox.enqueue``.
+    data : dict
+        Message parameters shared by all recipients, except ``to`` and
+        ``recipient-variables``.
+    recipients : iterable of (str, str, dict)
+        Email address, name and recipient variables of every recipient.
+
+    Returns the number of new recipients and the responses of all messages sent
+    from the outbox. Raises ``RuntimeError`` if any batch of this message was not sent.
+    """
+    queued = outbox.queued_recipients(f"{key}:")
+    recipients = (
+        recipient for recipient in recipients if recipient[0] not in queued
+    )
+    result = {"recipients": 0}
+    while batch := list(itertools.islice(recipients, batch_size)):
+        result["recipients"] += len(batch)
+        addresses = [address for address, _, _ in batch]
+        outbox.enqueue(
+            f"{key}:{hashlib.sha256(' '.join(sorted(addresses)).encode()).hexdigest()[:16]}",
+            {
+                **data,
+                "to": [f"{name} <{address}>" for address, name, _ in batch],
+                "recipient-variables": json.dumps(
+                    {address: variables for address, _, variables in batch}
+                ),
+            },
+            addresses,
+        )
+
+    result["responses"] = outbox.flush()
+    if errors := outbox.unsent(f"{key}:", prefix=True):
+        raise RuntimeError({**result, "errors": errors})
+    return result
 
 
 def send_to_participants(
@@ -229,6 +1396,7 @@ def send_to_participants(
     subject: str,
     talk: dict,
     from_email: str,
+    key: str,
 ):
     """
     Send an email to meeting participants.
@@ -239,32 +1407,33 @@ def send_to_participants(
         Email subject, format string expecting as variables keys of ``talk`` (see talks yaml).
     talk : dict
         Dictionary corresponding to an entry in the talks yaml file.
+    key : str
+        Idempotency key of the email, see ``Outbox.enqueue``.
     other_parameters :
         Keyword arguments to be passed to format the templates.
     """
-    message = template.render(**talk)
-    registrants = meeting_registrants(talk['zoom_meeting_id'])
-
-    # Defensively filter out invalid registrants
-    # See https://github.com/virtualscienceforum/automation/issues/27
-    registrants = [r for r in registrants if "email" in r and "join_url" in r]
-    data = {
-        "from": from_email,
-        "to": list({
-            f"{r.get('first_name', '')} {r.get('last_name', '')} <{r['email']}>"
-            for r in registrants
-        }),
-        "subject": subject.format(**talk),
-        "text": markdown_to_plain(message),
-        "html": markdown_to_email(message),
-        "recipient-variables": json.dumps(
-            {r["email"]: {"join_url": r["join_url"]}
-            for r in registrants}
-        ),
-    }
-
-    return api_query(
-        requests.post,
-        MAILGUN_DOMAIN + "messages",
-        data=data
+    bodies = render_email(template, **talk)
+
+    def recipients():
+        seen = set()
+        for r in meeting_registrants(talk['zoom_meeting_id']):
+            # Defensively filter out invalid registrants
+            # See https://github.com/virtualscienceforum/automation/issues/27
+            if "email" not in r or "join_url" not in r or r["email"] in seen:
+                continue
+            seen.add(r["email"])
+            yield (
+                r["email"],
+                f"{r.get('first_name', '')} {r.get('last_name', '')}",
+                {"join_url": r["join_url"]},
+            )
+
+    return send_batch(
+        key,
+        {
+            "from": from_email,
+            "subject": subject.format(**talk),
+            **bodies,
+        },
+        recipients(),
     )
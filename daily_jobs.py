@@ -2,20 +2,16 @@
 #!/usr/bin/env python
 
 import datetime
-import json
 import logging
 
-import jinja2
-import requests
 import pytz
 
 import common
-from common import api_query
 
 LIST = 'vsf-announce'
-MEMBERS_ENDPOINT = f'lists/{LIST}@{common.MAILGUN_DOMAIN}members.json'
+LIST_ADDRESS = f"{LIST}@{common.MAILGUN_DOMAIN.rstrip('/')}"
 
-RECORDING_AVAILABLE_TEMPLATE = jinja2.Template("""Dear {{speaker_name}},
+RECORDING_AVAILABLE_TEMPLATE = common.template("""Dear {{speaker_name}},
 
 The recording of your talk is available at [this URL]({{share_url}}).
 
@@ -38,7 +34,7 @@ Best,
 Virtual Science Forum team
 """)
 
-WEEKLY_ANNOUNCEMENT_TEMPLATE = jinja2.Template("""Dear %recipient_name%,
+WEEKLY_ANNOUNCEMENT_TEMPLATE = common.template("""Dear %recipient_name%,
 
 {% if this_week_talks %}This week the Speakers' Corner seminar series will have the following talks:
 
@@ -66,50 +62,43 @@ To unsubscribe visit [this URL](%mailing_list_unsubscribe_url%).
 def email_video_link(talk):
     """Send the presenter a link to their video, asking to confirm."""
     meeting_recordings = common.zoom_request(
-        requests.get,
+        common.session.get,
         common.ZOOM_API + f"/meetings/{talk['zoom_meeting_id']}/recordings"
     )
     if not len(meeting_recordings["recording_files"]):
         raise RuntimeError("No recordings found")
 
-    message = RECORDING_AVAILABLE_TEMPLATE.render(
+    bodies = common.render_email(
+        RECORDING_AVAILABLE_TEMPLATE,
         share_url=meeting_recordings["share_url"],
         **talk,
     )
 
-    response = common.api_query(
-        requests.post,
-        common.MAILGUN_DOMAIN + "messages",
-        data={
+    response = common.send_message(
+        f"recording-available:{talk['zoom_meeting_id']}",
+        {
             "from": "VSF team <no-reply@mail.virtualscienceforum.org>",
             "to": f"{talk['speaker_name']} <{talk['email']}>",
             "subject": "Approve your Speakers' Corner recording",
-            "text": common.markdown_to_plain(message),
-            "html": common.markdown_to_email(message),
+            **bodies,
         }
     )
     logging.info(f"Notified the speaker of {talk['zoom_meeting_id']} about recording.")
     return response
 
 
-def weekly_speakers_corner_update(talks):
-    # Filter out only the speakers' corner talks
+def weekly_speakers_corner_update(talks: common.TalkCatalog):
     now = datetime.datetime.now(tz=pytz.UTC)
     week = datetime.timedelta(days=7)
-    this_week_talks = list(filter(
-        (lambda talk: now < talk["time"] < now + week),
-        talks
-    ))
-    next_week_talks = list(filter(
-        (lambda talk: now + week < talk["time"] < now + 2*week),
-        talks
-    ))
+    this_week_talks = talks.between(now, now + week)
+    next_week_talks = talks.between(now + week, now + 2*week)
 
     if not any([this_week_talks, next_week_talks]):
         # Nothing to announce
         return
 
-    message = WEEKLY_ANNOUNCEMENT_TEMPLATE.render(
+    bodies = common.render_email(
+        WEEKLY_ANNOUNCEMENT_TEMPLATE,
         this_week_talks=this_week_talks,
         next_week_talks=next_week_talks,
     )
@@ -117,34 +106,23 @@ def weekly_speakers_corner_update(talks):
         "from": "VSF team <no-reply@mail.virtualscienceforum.org>",
         "to": "speakers_corner@mail.virtualscienceforum.org",
         "subject": "Speakers' Corner weekly schedule",
-        "text": common.markdown_to_plain(message),
-        "html": common.markdown_to_email(message),
+        **bodies,
     }
 
-    response = common.api_query(
-        requests.post,
-        common.MAILGUN_DOMAIN + "messages",
-        data=data
-    )
+    response = common.send_message(f"weekly-update:{now.date()}", data)
     logging.info("Sent the weekly update.")
     return response
 
 
 def subscribe_registrants_to_mailinglist(zoom_meeting_id):
     """Add registrants from Zoom to Mailgun mailing list."""
-    # Get registrants
-    registrants = common.meeting_registrants(zoom_meeting_id)
-
-    if registrants:
-        # Filter those who want to sign up for emails
-        member_data = dict(members=json.dumps([
-            dict(address=i['email'], name="{0} {1}".format(i.get('first_name'), i.get('last_name','')))
-            for i in registrants if (i.get('May we contact you about future Virtual Science Forum events?','') == "Yes")
-        ]))
-
-        api_query(requests.post, MEMBERS_ENDPOINT, data=member_data)
-
-    return
+    # Filter those who want to sign up for emails
+    added = common.sync_mailing_list(LIST_ADDRESS, (
+        dict(address=i['email'], name="{0} {1}".format(i.get('first_name'), i.get('last_name','')))
+        for i in common.meeting_registrants(zoom_meeting_id)
+        if (i.get('May we contact you about future Virtual Science Forum events?','') == "Yes")
+    ))
+    logging.info(f"Added {added} registrants of {zoom_meeting_id} to {LIST}.")
 
 
 if __name__ == "__main__":
@@ -153,11 +131,13 @@ if __name__ == "__main__":
     now = datetime.datetime.now(tz=pytz.UTC)
     exceptions = common.CollectExceptions()
 
-    talks, _ = common.talks_data()
-    talks = [talk for talk in talks if talk["event_type"] == "speakers_corner"]
+    today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    yesterday = today - datetime.timedelta(days=1)
+
+    talks = common.TalkCatalog(
+        common.read_talks(since=yesterday), event_type="speakers_corner"
+    )
     logging.info(f"Loaded {len(talks)} talks.")
-    for talk in talks:
-        talk["time"] = talk["time"].replace(tzinfo=pytz.UTC)
 
     # Weekly emails sent on Sundays
     if now.weekday() == 6:
@@ -165,14 +145,8 @@ if __name__ == "__main__":
             weekly_speakers_corner_update(talks)
             logging.info(f"Sent a weekly Speakers' corner announcement")
 
-    today = now.replace(hour=0, minute=0, second=0, microsecond=0)
-    for talk in talks:
-        # Select the talks from yesterday
-        if not(
-            datetime.timedelta(days=1) >= today - talk["time"] > datetime.timedelta()
-        ):
-            continue
-
+    # Select the talks from yesterday
+    for talk in talks.between(yesterday, today):
         if "zoom_meeting_id" not in talk:
             continue
 
@@ -190,4 +164,5 @@ if __name__ == "__main__":
         with exceptions:
             subscribe_registrants_to_mailinglist(talk["zoom_meeting_id"])
 
+    logging.info(f"HTTP connections: {common.connection_stats()}")
     exceptions.reraise()
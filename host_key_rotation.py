@@ -6,8 +6,6 @@ import datetime
 import json
 import logging
 
-import jinja2
-import requests
 import pytz
 from dateutil.parser import parse
 
@@ -25,7 +23,7 @@ def update_host_key(key: str):
     """Update the host key of the speakers' corner user for the upcoming hour."""
     logging.info("Updated the host key.")
     zoom_request(
-        requests.patch,
+        common.session.patch,
         common.ZOOM_API + "users/" + common.SPEAKERS_CORNER_USER_ID,
         data=json.dumps({"host_key": key})
     )
@@ -41,7 +39,7 @@ def rotate_meetings():
     """
     now = datetime.datetime.now(tz=pytz.UTC)
     hour = datetime.timedelta(hours=1)
-    sc_meetings = common.all_meetings(common.SPEAKERS_CORNER_USER_ID)
+    sc_meetings = list(common.all_meetings(common.SPEAKERS_CORNER_USER_ID))
     for m in sc_meetings:
         m["start_time"] = parse(m["start_time"])
 
@@ -52,14 +50,14 @@ def rotate_meetings():
         recent_id = recent["id"]
         if recent.get("live"):
             common.zoom_request(
-                requests.put,
+                common.session.put,
                 f"{common.ZOOM_API}meetings/{recent_id}/status",
                 json={"action": "end"},
             )
             logging.info(f"Stopped {recent_id}.")
 
         common.zoom_request(
-            requests.patch,
+            common.session.patch,
             f"{common.ZOOM_API}meetings/{recent_id}",
             json={"settings": {"join_before_host": False}},
         )
@@ -72,7 +70,7 @@ def rotate_meetings():
     ):
         upcoming_id = upcoming['id']
         common.zoom_request(
-            requests.patch,
+            common.session.patch,
             f"{common.ZOOM_API}meetings/{upcoming_id}",
             json={"settings": {"join_before_host": True}},
         )
@@ -85,7 +83,7 @@ def rotate_meetings():
 
 REMINDER_SUBJECT = "Speakers' Corner presentation by {speaker_name} starting soon"
 
-REMINDER_TEMPLATE = jinja2.Template("""Dear %recipient_name%,
+REMINDER_TEMPLATE = common.template("""Dear %recipient_name%,
 
 Thank you for registering for today's Speakers' Corner talk by {{speaker_name}}!
 The talk will begin in two hours ({{time.strftime('%-H:%M')}} UTC).
@@ -107,24 +105,21 @@ if __name__ == "__main__":
     logger.setLevel(logging.INFO)
     common.wait_until(45)
     now = datetime.datetime.now(tz=pytz.UTC)
+    hour = datetime.timedelta(hours=1)
     exceptions = common.CollectExceptions()
 
     with exceptions:
         rotate_meetings()
 
-    talks, _ = common.talks_data()
-    talks = [talk for talk in talks if talk["event_type"] == "speakers_corner"]
+    talks = common.TalkCatalog(
+        common.read_talks(since=now), event_type="speakers_corner"
+    )
     logging.info(f"Loaded {len(talks)} talks.")
-    for talk in talks:
-        talk["time"] = talk["time"].replace(tzinfo=pytz.UTC)
 
     with exceptions:
         # Remind about a talk starting in 2 hours.
         upcoming_talk = next(
-            (
-                talk for talk in talks
-                if (talk["time"] - now).total_seconds() // 3600 == 2
-            ),
+            iter(talks.between(now + 2*hour, now + 3*hour)),
             None
         )
         if upcoming_talk is not None:
@@ -138,9 +133,11 @@ if __name__ == "__main__":
                 subject=REMINDER_SUBJECT,
                 talk=upcoming_talk,
                 from_email="Speakers' Corner <no-reply@mail.virtualscienceforum.org>",
+                key=f"reminder:{upcoming_talk['zoom_meeting_id']}",
             )
             logging.info(
                 f"Sent a reminder to {upcoming_talk['zoom_meeting_id']} registrants."
             )
 
+    logging.info(f"HTTP connections: {common.connection_stats()}")
     exceptions.reraise()
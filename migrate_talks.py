@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+"""Move past talks from talks.yml into yearly archive shards.
+
+Operates on a local checkout of the website repository. Talks older than
+``--keep-days`` are appended to ``talks/<year>.yml``, unless their recording
+still awaits publication, because talk changes are only committed to the talks
+file. Then ``talks/manifest.yml`` is regenerated. Running the script again
+archives the talks that became old since the last run.
+"""
+import argparse
+import datetime
+from io import StringIO
+from pathlib import Path
+
+import common
+
+yaml = common.yaml
+
+
+def is_active(talk, cutoff: datetime.datetime) -> bool:
+    """Whether a talk needs to stay in the talks file."""
+    return (
+        talk["time"] >= cutoff
+        # Recordings are published after the talk, of any event type.
+        or ("zoom_meeting_id" in talk and "youtube_id" not in talk)
+    )
+
+
+def split_talks(text: str) -> tuple:
+    """Split a talks file into the text before the first talk and the talks.
+
+    Returns the header and a list of the text of each talk together with the
+    parsed talk. The text of a talk runs from its line to the line of the next
+    talk, so that the talks are moved byte for byte, with their comments.
+    """
+    root = common.pyyaml.compose(text, Loader=common.FastLoader)
+    if root is None or not root.value:
+        return text, []
+    if root.flow_style:
+        raise ValueError("Cannot split a talks file in flow style.")
+    starts = [text.rfind("\n", 0, item.start_mark.index) + 1 for item in root.value]
+    chunks = [
+        text[start:end] if text[start:end].endswith("\n") else text[start:end] + "\n"
+        for start, end in zip(starts, starts[1:] + [len(text)])
+    ]
+    return text[:starts[0]], list(zip(chunks, common.parse_talks_readonly(text)))
+
+
+def dump(talks, path: Path):
+    serialized = StringIO()
+    yaml.dump(talks, serialized)
+    path.write_text(serialized.getvalue())
+
+
+def migrate(checkout: Path, keep_days: int) -> int:
+    """Archive the old talks in a checkout, returning their number."""
+    cutoff = (
+        datetime.datetime.now(tz=datetime.timezone.utc)
+        - datetime.timedelta(days=keep_days)
+    )
+    talks_path = checkout / common.TALKS_FILE
+    header, talks = split_talks(talks_path.read_text())
+    archived = [(chunk, talk) for chunk, talk in talks if not is_active(talk, cutoff)]
+    if not archived:
+        return 0
+
+    manifest_path = checkout / common.ARCHIVE_MANIFEST
+    shards_dir = manifest_path.parent
+    shards_dir.mkdir(exist_ok=True)
+    for year in sorted({talk["time"].year for _, talk in archived}):
+        shard_path = shards_dir / f"{year}.yml"
+        shard_header, shard = (
+            split_talks(shard_path.read_text()) if shard_path.exists()
+            else ("", [])
+        )
+        shard += [(chunk, talk) for chunk, talk in archived if talk["time"].year == year]
+        shard.sort(key=lambda item: item[1]["time"])
+        shard_path.write_text(shard_header + "".join(chunk for chunk, _ in shard))
+
+    remaining = "".join(chunk for chunk, talk in talks if is_active(talk, cutoff))
+    talks_path.write_text(header + (remaining or "[]\n"))
+
+    shards = []
+    for shard_path in sorted(shards_dir.glob("[0-9]*.yml")):
+        times = [talk["time"] for talk in common.parse_talks_readonly(shard_path.read_text())]
+        shards.append({
+            "path": shard_path.relative_to(checkout).as_posix(),
+            "talks": len(times),
+            "first": min(times),
+            "last": max(times),
+        })
+    dump({"hot": common.TALKS_FILE, "shards": shards}, manifest_path)
+    return len(archived)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("checkout", type=Path, help="website repository checkout")
+    parser.add_argument(
+        "--keep-days", type=int, default=30,
+        help="keep the talks from this many past days in the talks file",
+    )
+    args = parser.parse_args()
+    print(f"Archived {migrate(args.checkout, args.keep_days)} talks.")
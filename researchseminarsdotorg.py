@@ -1,8 +1,9 @@
 import os
 import re
-from requests import get, post
 from datetime import timedelta
 
+from common import session
+
 SPEAKERS_CORNER_SEMINAR_SERIES = {"series_id": "speakerscorner",
            "name": "Speakers\' Corner",
            "is_conference": False,
@@ -24,7 +25,7 @@ SPEAKERS_CORNER_SEMINAR_SERIES = {"series_id": "speakerscorner",
 
 def find_seminar_series(series_id):
     url = f"https://researchseminars.org/api/0/search/series?series_id={series_id}"
-    r = get(url)
+    r = session.get(url)
     if r.status_code == 200:
         J = r.json()
         results = J["properties"]["results"]
@@ -33,7 +34,7 @@ def find_seminar_series(series_id):
 
 def create_seminar_series(payload, authorization):
     url = "https://researchseminars.org/api/0/save/series/"
-    r = post(url, json=payload, headers={"authorization":authorization})
+    r = session.post(url, json=payload, headers={"authorization":authorization})
     J = r.json()
     code = J.get("code")
 
@@ -48,7 +49,7 @@ def create_seminar_series(payload, authorization):
 
 def edit_seminar_series(name, payload, authorization):
     url = "https://researchseminars.org/api/0/save/series/"
-    r = post(url, json=payload, headers={"authorization":authorization})
+    r = session.post(url, json=payload, headers={"authorization":authorization})
     J = r.json()
     code = J.get("code")
 
@@ -62,7 +63,7 @@ def edit_seminar_series(name, payload, authorization):
 
 def add_talk_to_series(series_id, payload, authorization):
     url = "https://researchseminars.org/api/0/save/talk/"
-    r = post(url, json=payload, headers={"authorization":authorization})
+    r = session.post(url, json=payload, headers={"authorization":authorization})
     J = r.json()
     code = J.get("code")
     if r.status_code == 200:
@@ -1,14 +1,13 @@
 import os
 import secrets
-from io import StringIO
 from typing import Tuple
 import datetime
 import json
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 import github
-import requests
-import jinja2
 import pytz
 
 import common
@@ -16,7 +15,7 @@ from researchseminarsdotorg import publish_to_researchseminars
 from host_key_rotation import host_key
 
 
-EMAIL_TEMPLATE = jinja2.Template(
+EMAIL_TEMPLATE = common.template(
 """Dear {{ author }},
 
 Please respond as soon as possible in your [application issue]({{issue_url}})
@@ -97,6 +96,9 @@ REGISTRATION_QUESTIONS = {
     ]
 }
 
+# Talks scheduled concurrently are updated in their shared catalog one by one.
+catalog_lock = threading.Lock()
+
 
 
 def schedule_zoom_talk(
@@ -151,7 +153,7 @@ def schedule_zoom_talk(
 
     # Create the meeting
     response = common.zoom_request(
-        requests.post,
+        common.session.post,
         f"{common.ZOOM_API}users/{user_id}/meetings",
         data=json.dumps(request_body)
     )
@@ -188,7 +190,7 @@ def register_speaker(meeting_id, talk):
 
     # Send request
     response = common.zoom_request(
-        requests.post,
+        common.session.post,
         f"{common.ZOOM_API}meetings/{meeting_id}/registrants",
         data=json.dumps(request_payload)
     )
@@ -198,7 +200,7 @@ def register_speaker(meeting_id, talk):
 
 def patch_registration_questions(meeting_id):
     response = common.zoom_request(
-        requests.patch,
+        common.session.patch,
         f"{common.ZOOM_API}meetings/{meeting_id}/registrants/questions",
         data=json.dumps(REGISTRATION_QUESTIONS)
     )
@@ -217,7 +219,7 @@ def patch_registration_notification(meeting_id):
 
     # Create the meeting
     response = common.zoom_request(
-        requests.patch,
+        common.session.patch,
         f"{common.ZOOM_API}meetings/{meeting_id}",
         data=json.dumps(request_body)
     )
@@ -225,7 +227,11 @@ def patch_registration_notification(meeting_id):
     return response
 
 
-def notify_author(talk, join_url=None) -> str:
+def notify_author(talk, join_url=None, key=None) -> dict:
+    """Email the speaker the talk details and the host key.
+
+    ``key`` is the idempotency key of the email, by default one email per meeting.
+    """
     # Get the host key
     meeting_host_key = host_key(talk["zoom_meeting_id"])
 
@@ -247,7 +253,8 @@ def notify_author(talk, join_url=None) -> str:
     meeting_end = (talk["time"] + datetime.timedelta(hours=1)).strftime('%H:%M')
     meeting_date = talk["time"].strftime('%Y-%m-%d')
 
-    email_text = EMAIL_TEMPLATE.render(
+    bodies = common.render_email(
+        EMAIL_TEMPLATE,
         author=talk["speaker_name"],
         meeting_zoom_link=join_url,
         meeting_host_key=meeting_host_key,
@@ -263,58 +270,111 @@ def notify_author(talk, join_url=None) -> str:
         "from": "Speakers' Corner <no-reply@mail.virtualscienceforum.org>",
         "to": "{0} <{1}>".format(talk["speaker_name"], talk["email"]),
         "subject": "Speakers' Corner talk",
-        "text": common.markdown_to_plain(email_text),
-        "html": common.markdown_to_email(email_text),
+        **bodies,
     }
 
     logging.info(f"Sending an email to {talk['speaker_name']}.")
-    return common.api_query(
-        requests.post,
-        f"{common.MAILGUN_DOMAIN}messages",
-        data=data
+    return common.send_message(
+        key or f"notify-author:{talk['zoom_meeting_id']}", data
     )
 
-def schedule_talks(repo, talks) -> int:
-    num_updated = 0
-    for talk in talks:
-        # If we are not processing a speakers corner talk, or if the
-        # zoom meeting id has already been set, there's nothing left to do
-        if (
+
+def schedule_talk(talks, talk) -> Tuple[dict, Exception]:
+    """Schedule a Zoom meeting for a talk, notify the speaker and publish it.
+
+    talks : common.TalkCatalog
+        Catalog of ``talk``, updated with the new fields.
+
+    Returns the new fields of the talk, or ``None`` if no meeting was created,
+    and the error of notifying the speaker, if any. The error is returned
+    rather than raised, so that the new meeting is still recorded.
+    """
+    is_speakers_corner = talk["event_type"] == "speakers_corner"
+    meeting_id, registration_url, join_url = schedule_zoom_talk(
+        talk,
+        user_id=(
+            common.SPEAKERS_CORNER_USER_ID if is_speakers_corner
+            else common.VSF_USER_ID
+        ),
+        header=(
+            "Speakers\' Corner talk" if is_speakers_corner
+            else "Long Range Colloquium"
+        ),
+        auto_recording=("cloud" if is_speakers_corner else "none"),
+    )
+    if not meeting_id:
+        return None, None
+
+    changes = {"zoom_meeting_id": meeting_id, "registration_url": registration_url}
+    with catalog_lock:
+        talk = talks.update("workflow_issue", talk["workflow_issue"], changes)
+
+    # Email the author
+    error = None
+    if is_speakers_corner:
+        try:
+            notify_author(talk, join_url)
+        except Exception as e:
+            error = e
+
+    # Add this talk to researchseminars.org
+    try:
+        publish_to_researchseminars(talk)
+    except Exception:
+        logging.error("Failed to add the talk to researchseminars.org")
+
+    return changes, error
+
+
+def schedule_talks(repo, talks, workers=1, exceptions=None, skip=()) -> dict:
+    """Schedule Zoom meetings for new talks and notify their speakers.
+
+    talks : common.TalkCatalog
+    workers : int
+        Number of talks scheduled concurrently.
+    exceptions : common.CollectExceptions, optional
+        Collects the errors of individual talks, so that the remaining talks
+        are still scheduled. Without it the first error is raised.
+    skip : set, optional
+        The ``workflow_issue`` of talks not to schedule.
+
+    Returns the new fields of the scheduled talks, see ``common.patch_talks``,
+    also of the talks whose speakers could not be notified.
+    """
+    # If we are not processing a speakers corner talk, or if the
+    # zoom meeting id has already been set, there's nothing left to do
+    new_talks = [
+        talk for talk in talks
+        if not (
             "zoom_meeting_id" in talk  # Already scheduled
             or "youtube_id" in talk  # Already published
             or talk["event_type"] not in ["speakers_corner", "lrc"]  # Not for this workflow
-        ):
-            continue
-
-        is_speakers_corner = talk["event_type"] == "speakers_corner"
-        meeting_id, registration_url, join_url = schedule_zoom_talk(
-            talk,
-            user_id=(
-                common.SPEAKERS_CORNER_USER_ID if is_speakers_corner
-                else common.VSF_USER_ID
-            ),
-            header=(
-                "Speakers\' Corner talk" if is_speakers_corner
-                else "Long Range Colloquium"
-            ),
-            auto_recording=("cloud" if is_speakers_corner else "none"),
+            or talk["workflow_issue"] in skip  # Meeting not recorded yet
         )
-        if meeting_id:
-            talk["zoom_meeting_id"] = meeting_id
-            talk["registration_url"] = registration_url
-
-            # Email the author
-            if is_speakers_corner:
-                notify_author(talk, join_url)
-            num_updated += 1
-
-            # Add this talk to researchseminars.org
-            try:
-                publish_to_researchseminars(talk)
-            except Exception:
-                logging.error("Failed to add the talk to researchseminars.org")
+    ]
 
-    return num_updated
+    changes = {}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(schedule_talk, talks, talk): talk for talk in new_talks}
+        for future in as_completed(futures):
+            workflow_issue = futures[future]["workflow_issue"]
+            if exceptions is not None and future.exception() is not None:
+                logging.error(f"Failed to schedule the talk from {workflow_issue}.")
+                with exceptions:
+                    raise future.exception()
+                continue
+
+            talk_changes, error = future.result()
+            if talk_changes is not None:
+                changes[workflow_issue] = talk_changes
+            if error is not None:
+                logging.error(f"Failed to notify the speaker of {workflow_issue}.")
+                if exceptions is None:
+                    raise error
+                with exceptions:
+                    raise error
+
+    return changes
 
 
 if __name__ == "__main__":
@@ -323,19 +383,40 @@ if __name__ == "__main__":
     # Get a handle on the repository
     target_branch = "master"
     repo = common.vsf_repo()
-    talks, sha = common.talks_data(repo=repo)
-    yaml = common.yaml
+    now = datetime.datetime.now(tz=pytz.UTC)
+    exceptions = common.CollectExceptions()
+    talk_changes = common.TalkChangeQueue()
+
+    # Meetings created by earlier runs that failed to record them are recorded
+    # first, so that their talks are not scheduled again. Talks whose meetings
+    # still can't be recorded are skipped.
+    if any("zoom_meeting_id" in changes for changes in talk_changes.queued().values()):
+        with exceptions:
+            talk_changes.flush(repo, branch=target_branch)
+    scheduled = {
+        workflow_issue
+        for workflow_issue, changes in talk_changes.queued().items()
+        if "zoom_meeting_id" in changes
+    }
 
+    # Talks waiting to be scheduled are never archived.
+    talks = common.read_talks(ref=target_branch, repo=repo, since=now)
+    changes = schedule_talks(
+        repo,
+        talks,
+        workers=int(os.getenv("SCHEDULE_WORKERS", 4)),
+        exceptions=exceptions,
+        skip=scheduled,
+    )
     # If we added Zoom links, we should update the file in the repo
-    if (num_updated := schedule_talks(repo, talks)):
-        commit_message = f"add Zoom link{'s' * (num_updated > 1)} for {num_updated} talks"
-        serialized = StringIO()
-        yaml.dump(talks, serialized)
-
-        repo.update_file(
-            common.TALKS_FILE,
-            commit_message,
-            serialized.getvalue(),
-            sha=sha,
-            branch=target_branch,
-        )
+    if changes:
+        num_updated = len(changes)
+        logging.info(f"Scheduled {num_updated} talks.")
+        for workflow_issue, talk_change in changes.items():
+            talk_changes.add(
+                workflow_issue, talk_change, f"add a Zoom link for the talk from {workflow_issue}"
+            )
+        talk_changes.flush(repo, branch=target_branch)
+
+    logging.info(f"HTTP connections: {common.connection_stats()}")
+    exceptions.reraise()
@@ -5,9 +5,7 @@ from typing import Tuple
 import datetime
 import json
 import github
-import requests
 from ruamel.yaml import YAML
-import jinja2
 import pytz
 
 import common
@@ -37,15 +35,13 @@ def main():
     header = yaml.load(header)
     if (to := header["to"]) in MAILING_LIST_DESCRIPTIONS:
         body += MAILING_LIST_FOOTER(MAILING_LIST_DESCRIPTIONS[to])
-        response = common.api_query(
-            requests.post,
-            common.MAILGUN_DOMAIN + "messages",
-            data={
+        response = common.send_message(
+            f"issue:{issue.number}",
+            {
                 "from": header["from"],
                 "to": to + "@mail.virtualscienceforum.org",
                 "subject": header["subject"],
-                "text": common.markdown_to_plain(body),
-                "html": common.markdown_to_email(body),
+                **common.email_bodies(body),
             }
         )
     else:
@@ -57,10 +53,8 @@ def main():
                 return
             key, value = "workflow_issue", int(to[1:])
         # We are sending an email to zoom meeting participants
-        talks, _ = common.talks_data(repo=repo)
-        try:
-            talk = next(talk for talk in talks if talk.get(key) == value)
-        except StopIteration:
+        talk = common.read_talks(repo=repo).get(key, value)
+        if talk is None:
             if key == "workflow_issue":
                 issue.create_comment("I couldn't parse to whom to send the email :(")
                 return
@@ -71,10 +65,11 @@ def main():
         body += MEETING_MESSAGE_FOOTER(talk["zoom_meeting_id"])
 
         response = common.send_to_participants(
-            template=jinja2.Template(body),
+            template=common.template(body),
             from_email=header["from"],
             subject=header["subject"],
             talk=talk,
+            key=f"issue:{issue.number}",
         )
 
     issue.create_comment("I sent the email 🎉!")
@@ -1,11 +1,12 @@
 import os
+import sys
 
-from common import talks_data
+from common import read_talks
 from schedulezoomtalks import notify_author
 
 if __name__ == "__main__":
-    talks, _ = talks_data()
     issue_number = int(os.getenv("ISSUE_NUMBER"))
-    notify_author(
-        next(talk for talk in talks if talk["workflow_issue"] == issue_number)
-    )
\ No newline at end of file
+    if (talk := read_talks().get("workflow_issue", issue_number)) is None:
+        sys.exit(f"No talk with workflow issue {issue_number}")
+    # Every request for the host key gets an email, but reruns don't.
+    notify_author(talk, key=f"share-host-key:{issue_number}:{os.getenv('GITHUB_RUN_ID')}")
\ No newline at end of file
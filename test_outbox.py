@@ -0,0 +1,119 @@
+"""Tests of sending emails through the outbox."""
+import json
+
+import pytest
+
+import common
+
+
+class FakeMailgun:
+    """Records the sent messages, failing those addressed to any of ``failing``."""
+
+    def __init__(self, failing=(), failures=float("inf")):
+        self.failing, self.failures = set(failing), failures
+        self.calls, self.sent = 0, []
+
+    def __call__(self, method, url, data):
+        self.calls += 1
+        if self.failures and self.failing & set(data["to"]):
+            self.failures -= 1
+            raise RuntimeError("Mailgun is down")
+        self.sent.append(data)
+        return {"id": len(self.sent)}
+
+
+@pytest.fixture
+def mailgun(monkeypatch, tmp_path):
+    monkeypatch.setattr(common, "outbox", common.Outbox(tmp_path / "outbox.sqlite"))
+    monkeypatch.setattr(common, "sleep", lambda delay: None)
+
+    def install(**kwargs):
+        fake = FakeMailgun(**kwargs)
+        monkeypatch.setattr(common, "api_query", fake)
+        return fake
+
+    return install
+
+
+def message(to):
+    return {"from": "vsf@example.org", "to": [to], "subject": "Hi", "text": "Hello"}
+
+
+def test_retry(mailgun):
+    fake = mailgun(failing=["a@example.org"], failures=2)
+    assert common.send_message("a", message("a@example.org")) == {"a": {"id": 1}}
+    assert fake.calls == 3
+    assert common.outbox.unsent("a") == {}
+
+
+def test_give_up(mailgun):
+    fake = mailgun(failing=["bad@example.org"])
+    for _ in range(common.OUTBOX_MAX_ATTEMPTS // common.OUTBOX_ATTEMPTS):
+        with pytest.raises(RuntimeError, match="Mailgun is down"):
+            common.send_message("bad", message("bad@example.org"))
+    assert fake.calls == common.OUTBOX_MAX_ATTEMPTS
+    status, attempts = common.outbox._execute(
+        "SELECT status, attempts FROM messages WHERE key = 'bad'"
+    )[0]
+    assert (status, attempts) == ("failed", common.OUTBOX_MAX_ATTEMPTS)
+
+    # The failed message is not retried, and doesn't stop other messages.
+    assert common.send_message("good", message("good@example.org")) == {"good": {"id": 1}}
+    assert fake.calls == common.OUTBOX_MAX_ATTEMPTS + 1
+
+
+def test_other_failures_dont_raise(mailgun):
+    mailgun(failing=["bad@example.org"])
+    common.outbox.enqueue("bad", message("bad@example.org"))
+    assert common.send_message("good", message("good@example.org")) == {"good": {"id": 1}}
+    assert set(common.outbox.unsent("bad")) == {"bad"}
+
+
+def test_dedupe_on_rerun(mailgun):
+    fake = mailgun()
+    common.send_message("a", message("a@example.org"))
+    assert common.send_message("a", message("a@example.org")) == {}
+    assert fake.calls == 1
+
+
+def recipients(*names):
+    return [(f"{name}@example.org", name.title(), {"name": name}) for name in names]
+
+
+def test_batch_recipient_variables(mailgun):
+    fake = mailgun()
+    data = {"from": "vsf@example.org", "subject": "Hi %recipient.name%", "text": "Hello"}
+    result = common.send_batch("talk", data, recipients("a", "b", "c", "d", "e"), batch_size=2)
+    assert result["recipients"] == 5
+    assert len(fake.sent) == 3
+    for sent in fake.sent:
+        variables = json.loads(sent["recipient-variables"])
+        assert sent["to"] == [f"{v['name'].title()} <{a}>" for a, v in variables.items()]
+        assert sent["subject"] == data["subject"]
+    assert sorted(
+        name for sent in fake.sent for name in json.loads(sent["recipient-variables"])
+    ) == [f"{name}@example.org" for name in "abcde"]
+
+
+def test_batch_rerun_skips_queued_recipients(mailgun):
+    fake = mailgun()
+    data = {"from": "vsf@example.org", "subject": "Hi", "text": "Hello"}
+    common.send_batch("talk", data, recipients("a", "b", "c"), batch_size=2)
+    result = common.send_batch("talk", data, recipients("a", "b", "c", "d"), batch_size=2)
+    assert result["recipients"] == 1
+    assert len(fake.sent) == 3
+    assert json.loads(fake.sent[-1]["recipient-variables"]) == {"d@example.org": {"name": "d"}}
+
+    # Another message to the same recipients is sent again.
+    assert common.send_batch("other", data, recipients("a"))["recipients"] == 1
+
+
+def test_batch_failure(mailgun):
+    mailgun(failing=["C <c@example.org>"])
+    data = {"from": "vsf@example.org", "subject": "Hi", "text": "Hello"}
+    with pytest.raises(RuntimeError) as error:
+        common.send_batch("talk", data, recipients("a", "b", "c"), batch_size=2)
+    result = error.value.args[0]
+    assert result["recipients"] == 3
+    assert len(result["responses"]) == 1
+    assert len(result["errors"]) == 1
@@ -0,0 +1,262 @@
+"""Regression tests of writing talk changes back to the talks file."""
+from types import SimpleNamespace
+
+import github
+import pytest
+import yaml
+
+import common
+import migrate_talks
+
+TALKS = """\
+# Talks of the VSF
+- title: Émergence of “quantum” order
+  speaker_name: Ålice Ünal  # invited
+  # Always in UTC
+  time: 2021-01-01 15:00:00
+  abstract: |
+    First paragraph.
+
+    Second paragraph — with ünïcode.
+  workflow_issue: 10
+  zoom_meeting_id: 123  # the old meeting
+  registration_url: https://example.org/register
+- {title: Flow style, time: 2021-01-02 15:00:00, workflow_issue: 11}
+- title: Last talk
+  time: 2021-01-03 15:00:00
+  workflow_issue: 12
+  zoom_meeting_id: 456
+  youtube_id: abc
+"""
+
+
+def patched(changes, text=TALKS):
+    new_text, applied = common.patch_talks(text, changes)
+    assert applied == set(changes)
+    return new_text
+
+
+def test_unchanged_fields_stay_intact():
+    assert patched({10: {"youtube_id": None}, 12: {"youtube_id": "abc"}}) == TALKS
+
+
+def test_change_field():
+    assert patched({12: {"youtube_id": "xyz"}}) == TALKS.replace(
+        "youtube_id: abc", "youtube_id: xyz"
+    )
+
+
+def test_add_fields():
+    assert patched({10: {"youtube_id": "xyz", "preprint": "2101.00001"}}) == TALKS.replace(
+        "register\n", "register\n  youtube_id: xyz\n  preprint: '2101.00001'\n"
+    )
+
+
+def test_long_values_stay_on_one_line():
+    url = "https://zoom.us/meeting/register/" + "tJ0sdu2hrz0rHdTmbLFJZh3A3LeKDQZ2Ap4y" * 3
+    title = "A very long title " * 10
+    assert patched({12: {"registration_url": url, "title": title}}) == TALKS.replace(
+        "Last talk", f"'{title}'"
+    ).replace("youtube_id: abc", f"youtube_id: abc\n  registration_url: {url}")
+
+
+def test_remove_trailing_fields():
+    assert patched({12: {"zoom_meeting_id": None, "youtube_id": None}}) == TALKS.replace(
+        "  zoom_meeting_id: 456\n  youtube_id: abc\n", ""
+    )
+
+
+def test_remove_trailing_fields_without_final_line_break():
+    text = TALKS.rstrip("\n")
+    assert patched({12: {"youtube_id": None}}, text) == text.replace("\n  youtube_id: abc", "")
+
+
+def test_replace_trailing_fields():
+    assert patched(
+        {10: {"zoom_meeting_id": None, "registration_url": None, "youtube_id": "xyz"}}
+    ) == TALKS.replace(
+        "  zoom_meeting_id: 123  # the old meeting\n"
+        "  registration_url: https://example.org/register\n",
+        "  youtube_id: xyz\n",
+    )
+
+
+def test_remove_middle_fields_next_to_comments():
+    # The inline comment goes with its field, the comment line stays.
+    assert patched({10: {"speaker_name": None}}) == TALKS.replace(
+        "  speaker_name: Ålice Ünal  # invited\n", ""
+    )
+    assert patched({10: {"zoom_meeting_id": None}}) == TALKS.replace(
+        "  zoom_meeting_id: 123  # the old meeting\n", ""
+    )
+
+
+def test_remove_first_field():
+    assert patched({12: {"title": None}}) == TALKS.replace(
+        "- title: Last talk\n  time: 2021-01-03", "- time: 2021-01-03"
+    )
+
+
+def test_block_scalars():
+    assert patched({10: {"abstract": None}}) == TALKS.replace(
+        "  abstract: |\n    First paragraph.\n\n    Second paragraph — with ünïcode.\n", ""
+    )
+    text = patched({10: {"abstract": "New — abstract.\n\nSecond paragraph.\n"}})
+    assert yaml.safe_load(text)[0]["abstract"] == "New — abstract.\n\nSecond paragraph.\n"
+    assert text.split("  workflow_issue: 10")[1] == TALKS.split("  workflow_issue: 10")[1]
+
+
+def test_non_ascii():
+    text = patched({10: {"title": "Ça marche — “yes”", "speaker_name": "Zoë"}})
+    talk = yaml.safe_load(text)[0]
+    assert talk["title"] == "Ça marche — “yes”"
+    assert talk["speaker_name"] == "Zoë"
+    assert "# invited\n  # Always in UTC\n" in text
+
+
+def test_result_parses():
+    text = patched({
+        10: {"speaker_name": None, "time": None, "youtube_id": "xyz"},
+        12: {"title": None, "youtube_id": None, "zoom_meeting_id": 789},
+    })
+    first, _, last = yaml.safe_load(text)
+    assert "speaker_name" not in first and "time" not in first
+    assert first["youtube_id"] == "xyz"
+    assert last == {"time": last["time"], "workflow_issue": 12, "zoom_meeting_id": 789}
+
+
+def test_flow_style():
+    with pytest.raises(ValueError, match="flow style"):
+        common.patch_talks(TALKS, {11: {"youtube_id": "xyz"}})
+
+
+def test_remove_all_fields():
+    with pytest.raises(ValueError):
+        common.patch_talks(TALKS, {11: dict.fromkeys(["title", "time", "workflow_issue"])})
+
+
+def test_missing_talk():
+    assert common.patch_talks(TALKS, {99: {"youtube_id": "xyz"}}) == (TALKS, set())
+    text, applied = common.patch_talks(TALKS, {12: {"youtube_id": "xyz"}, 99: {"title": "x"}})
+    assert applied == {12}
+    assert text == TALKS.replace("youtube_id: abc", "youtube_id: xyz")
+
+
+class FakeRepo:
+    """Talks file in a repository that others push to in the meantime."""
+
+    def __init__(self, text, pushes=()):
+        self.text, self.sha, self.pushes = text, 0, list(pushes)
+        self.commits = []
+
+    def get_contents(self, path, ref):
+        return SimpleNamespace(decoded_content=self.text.encode(), sha=self.sha)
+
+    def update_file(self, path, message, text, sha, branch):
+        if self.pushes:
+            self.text, self.sha = self.pushes.pop(0)(self.text), self.sha + 1
+        if sha != self.sha:
+            raise github.GithubException(409, {"message": "conflict"}, None)
+        self.text, self.sha = text, self.sha + 1
+        self.commits.append(message)
+
+
+@pytest.fixture(autouse=True)
+def no_sleep(monkeypatch):
+    monkeypatch.setattr(common, "sleep", lambda delay: None)
+
+
+def test_commit_talks_reapplies_after_conflicts():
+    def other_push(text):
+        return text.replace("Last talk", "Last talk, renamed")
+
+    repo = FakeRepo(TALKS, pushes=[other_push])
+    applied = common.commit_talks(repo, {12: {"youtube_id": "xyz"}}, "Publish")
+    assert applied == {12}
+    assert repo.commits == ["Publish"]
+    assert repo.text == other_push(TALKS).replace("youtube_id: abc", "youtube_id: xyz")
+
+
+def test_commit_talks_gives_up():
+    repo = FakeRepo(TALKS, pushes=[lambda text: text] * 3)
+    with pytest.raises(github.GithubException):
+        common.commit_talks(repo, {12: {"youtube_id": "xyz"}}, "Publish", attempts=3)
+    assert repo.commits == []
+
+
+def test_commit_talks_missing_talk():
+    repo = FakeRepo(TALKS)
+    assert common.commit_talks(repo, {99: {"youtube_id": "xyz"}}, "Publish") == set()
+    assert repo.commits == []
+    assert repo.text == TALKS
+
+
+def test_flush_keeps_changes_of_missing_talks(tmp_path):
+    queue = common.TalkChangeQueue(tmp_path / "changes.json")
+    queue.add(12, {"youtube_id": "xyz"}, "publish 12")
+    queue.add(99, {"youtube_id": "uvw"}, "publish 99")
+    repo = FakeRepo(TALKS)
+    assert queue.flush(repo) == {12: True, 99: False}
+    assert repo.commits == ["update 2 talks\n\n- publish 12\n- publish 99"]
+    assert queue.queued() == {99: {"youtube_id": "uvw"}}
+
+
+def test_flush_drops_rejected_changes(tmp_path):
+    queue = common.TalkChangeQueue(tmp_path / "changes.json")
+    queue.add(11, {"youtube_id": "uvw"}, "publish 11")
+    queue.add(12, {"youtube_id": "xyz"}, "publish 12")
+    repo = FakeRepo(TALKS)
+    assert queue.flush(repo) == {11: False, 12: True}
+    assert repo.commits == ["publish 12"]
+    assert repo.text == TALKS.replace("youtube_id: abc", "youtube_id: xyz")
+    assert queue.queued() == {}
+    assert queue.flush(repo) == {}
+
+
+def test_migrate_talks_moves_text_unchanged(tmp_path):
+    old, published, awaiting, new = (
+        "- title: Old\n  time: 2020-05-01 15:00:00  # first\n  event_type: lrc\n"
+        "  workflow_issue: 1\n# Comment before the next talk\n",
+        "- title: Published\n  time: 2021-02-01 15:00:00\n  event_type: speakers_corner\n"
+        "  workflow_issue: 2\n  youtube_id: abc\n",
+        "- title: Awaiting publication\n  time: 2021-03-01 15:00:00\n  event_type: lrc\n"
+        "  workflow_issue: 3\n  zoom_meeting_id: 123\n",
+        "- title: New\n  time: 2030-01-01 15:00:00\n  event_type: lrc\n  workflow_issue: 4\n",
+    )
+    (tmp_path / "talks.yml").write_text("# Talks\n" + new + old + awaiting + published)
+    (tmp_path / "talks").mkdir()
+    (tmp_path / "talks" / "2021.yml").write_text("# 2021\n" + published.replace("2021-02", "2021-04"))
+
+    assert migrate_talks.migrate(tmp_path, keep_days=30) == 2
+    assert (tmp_path / "talks.yml").read_text() == "# Talks\n" + new + awaiting
+    assert (tmp_path / "talks" / "2020.yml").read_text() == old
+    assert (tmp_path / "talks" / "2021.yml").read_text() == (
+        "# 2021\n" + published + published.replace("2021-02", "2021-04")
+    )
+    manifest = yaml.safe_load((tmp_path / "talks" / "manifest.yml").read_text())
+    assert [shard["talks"] for shard in manifest["shards"]] == [1, 2]
+    assert migrate_talks.migrate(tmp_path, keep_days=30) == 0
+
+
+def test_catalog_update_keeps_indexes():
+    talks = common.parse_talk_records(TALKS)
+    talk = talks.update("workflow_issue", 12, {"zoom_meeting_id": 789, "youtube_id": None})
+    assert talks.get("zoom_meeting_id", 789) is talk
+    assert talks.get("zoom_meeting_id", 456) is None
+    assert talks.get("youtube_id", "abc") is None
+
+    talks.update("workflow_issue", 10, {"time": talk["time"] + common.datetime.timedelta(1)})
+    assert [talk["workflow_issue"] for talk in talks.between(
+        talk["time"], talk["time"] + common.datetime.timedelta(2)
+    )] == [12, 10]
+
+
+def test_catalog_update_keeps_time():
+    talks = common.parse_talk_records(TALKS)
+    talk = talks.get("workflow_issue", 12)
+    with pytest.raises(ValueError):
+        talks.update("workflow_issue", 12, {"time": None, "youtube_id": None})
+    assert talk["youtube_id"] == "abc"
+    assert talks.between(talk["time"], talk["time"] + common.datetime.timedelta(1)) == [talk]
+    with pytest.raises(KeyError):
+        talks.update("workflow_issue", 99, {"youtube_id": "xyz"})
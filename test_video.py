@@ -0,0 +1,72 @@
+"""Tests of splitting trimmed videos into copied and re-encoded segments."""
+from datetime import timedelta
+
+import pytest
+
+pytest.importorskip("googleapiclient")
+import video  # noqa: E402
+
+KEYFRAMES = [0.0, 10.0, 20.0, 30.0]
+
+
+@pytest.mark.parametrize("start, end, segments", [
+    # Keyframes before, inside and after the interval.
+    (5, 25, [(5, 10, False), (10, 20, True), (20, 25, False)]),
+    # Keyframes on the bounds of the interval.
+    (0, 30, [(0, 30, True)]),
+    (10, 25, [(10, 20, True), (20, 25, False)]),
+    (5, 20, [(5, 10, False), (10, 20, True)]),
+    # A single keyframe inside, no complete group of pictures.
+    (5, 15, [(5, 15, False)]),
+    (10, 15, [(10, 15, False)]),
+    # Keyframes only before or only after the interval.
+    (31, 40, [(31, 40, False)]),
+    (-5, -1, [(-5, -1, False)]),
+    # Zero-length intervals, also on a keyframe.
+    (5, 5, []),
+    (10, 10, []),
+    (12, 10, []),
+])
+def test_trim_segments(start, end, segments):
+    assert video.trim_segments(
+        [(timedelta(seconds=start), timedelta(seconds=end))], KEYFRAMES
+    ) == segments
+
+
+def test_trim_segments_of_several_intervals():
+    assert video.trim_segments(
+        [
+            (timedelta(seconds=2), timedelta(seconds=12)),
+            (timedelta(seconds=15), timedelta(seconds=15)),
+            (timedelta(seconds=18), timedelta(seconds=35)),
+        ],
+        KEYFRAMES,
+    ) == [(2, 12, False), (18, 20, False), (20, 30, True), (30, 35, False)]
+
+
+def test_trim_segments_without_keyframes():
+    assert video.trim_segments([(timedelta(0), timedelta(seconds=5))], []) == [(0, 5, False)]
+
+
+@pytest.mark.parametrize("segments, slices", [
+    # Copied segments are never split.
+    ([(0, 500, True)], [(0, 500, True)]),
+    ([(0, 100, False)], [(0, 100, False)]),
+    ([(0, 120, False)], [(0, 120, False)]),
+    ([(0, 240, False)], [(0, 120, False), (120, 240, False)]),
+    ([(0, 250, False)], [(0, 250 / 3, False), (250 / 3, 500 / 3, False), (500 / 3, 250, False)]),
+    ([(5, 5, False), (5, 5, True)], []),
+    (
+        [(5, 10, False), (10, 300, True), (300, 420, False)],
+        [(5, 10, False), (10, 300, True), (300, 420, False)],
+    ),
+])
+def test_split_segments(segments, slices):
+    assert video.split_segments(segments, 120) == pytest.approx(slices)
+
+
+@pytest.mark.parametrize("start", [x / 100 for x in range(0, 1000, 7)])
+def test_split_segments_leaves_no_empty_slices(start):
+    slices = video.split_segments([(start, start + 240, False)], 120)
+    assert [end - begin for begin, end, _ in slices] == pytest.approx([120, 120])
+    assert slices[0][0] == start and slices[-1][1] == start + 240
@@ -1,36 +1,99 @@
 """Utilities for manipulating and publishing videos"""
 from typing import List
-from subprocess import check_call
+from subprocess import check_call, check_output, Popen, PIPE, CalledProcessError
 import os
 import sys
 from pathlib import Path
 import json
 import logging
 import re
-from io import StringIO
-
-import requests
-from ruamel.yaml import YAML
-import jinja2
+import argparse
+import datetime
+import bisect
+import math
+import hashlib
+import contextlib
+import shutil
+import threading
+import random
+from time import monotonic, sleep
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import httplib2
 from dateutil.parser import parse
 from  google.oauth2.credentials import Credentials
 from google.auth.transport.requests import Request
 import googleapiclient.discovery
 import googleapiclient.errors
-from googleapiclient.http import MediaFileUpload
+from googleapiclient.http import MediaFileUpload, MediaUpload
 
 import common
 
 
 doi_regex = re.compile(r"10.\d{4,9}/[-._;()/:A-Z0-9]+")
 
-def download_video(zoom_meeting_id):
-    files = requests.get(
-        f"https://api.zoom.us/v2/meetings/{zoom_meeting_id}/recordings",
-        headers=common.zoom_headers()
-    )
-    files.raise_for_status()
-    files = files.json()["recording_files"]
+DOWNLOAD_WORKERS = int(os.getenv("VSF_DOWNLOAD_WORKERS", 4))  # Concurrent connections
+DOWNLOAD_PART_SIZE = 32 * 2**20  # Bytes per ranged request
+UPLOAD_CHUNK_SIZE = int(os.getenv("VSF_UPLOAD_CHUNK_SIZE", 64 * 2**20))  # Multiple of 256 KiB
+UPLOAD_RETRIABLE_STATUS = (500, 502, 503, 504)
+UPLOAD_MAX_RETRIES = 8
+UPLOAD_SESSIONS = common.CACHE_DIR / "youtube_uploads"
+TRIM_TOLERANCE = 1  # Seconds the trimmed video may differ from the intervals
+TRIM_WORKERS = int(os.getenv("VSF_TRIM_WORKERS", os.cpu_count() or 1))  # Parallel ffmpeg processes
+TRIM_SLICE = 120  # Longest re-encoded segment in seconds
+VIDEO_CACHE = common.CACHE_DIR / "videos"
+VIDEO_CACHE_SIZE = int(os.getenv("VSF_VIDEO_CACHE_SIZE", 4 * 2**30))  # Bytes
+PUBLISH_WORKERS = int(os.getenv("VSF_PUBLISH_WORKERS", 2))  # Videos published at the same time
+# Download, trim and upload at the same time, without storing the video.
+STREAM_VIDEO = os.getenv("VSF_STREAM_VIDEO") == "1"
+
+videos_in_use = set()  # Videos that other threads are still working on
+video_cache_lock = threading.Lock()
+
+
+def evict_videos(needed: int, keep=()):
+    """Delete the least recently used videos to make room for ``needed`` bytes.
+
+    Videos in ``keep`` and ``videos_in_use``, and their partial downloads,
+    are never deleted. The videos in ``keep`` are added to ``videos_in_use``.
+    """
+    with video_cache_lock:
+        videos_in_use.update(keep)
+        videos = []
+        for path in VIDEO_CACHE.glob("*.mp4"):
+            with contextlib.suppress(FileNotFoundError):
+                # Partial files may be renamed meanwhile.
+                videos.append((path.stat().st_mtime, path.stat().st_size, path))
+        videos.sort()
+        total = sum(size for _, size, _ in videos) + needed
+        for _, size, path in videos:
+            if total <= VIDEO_CACHE_SIZE:
+                break
+            final = path.with_name(path.name.removesuffix(".partial.mp4"))
+            if path in videos_in_use or final in videos_in_use:
+                continue
+            logging.info(f"Evicting {path.name} from the video cache.")
+            path.unlink()
+            path.with_name(path.name + ".parts").unlink(missing_ok=True)
+            total -= size
+
+
+def discard_videos(paths):
+    """Delete published videos, so that the Actions cache only keeps unfinished work."""
+    with video_cache_lock:
+        for path in paths:
+            if path in videos_in_use:
+                continue
+            path.unlink(missing_ok=True)
+            path.with_name(path.name + ".parts").unlink(missing_ok=True)
+
+
+def recording_file(zoom_meeting_id) -> dict:
+    """Return the Zoom recording file with the shared screen and the speaker."""
+    files = common.zoom_request(
+        common.session.get,
+        f"{common.ZOOM_API}meetings/{zoom_meeting_id}/recordings",
+    )["recording_files"]
     try:
         video_recording, = (
             file for file in files
@@ -38,21 +101,108 @@ def download_video(zoom_meeting_id):
         )
     except ValueError as e:
         raise RuntimeError("Could not find a single recording file.") from e
+    return video_recording
+
 
-    mp4_response = requests.get(
+def get_recording(video_recording, **kwargs):
+    """Request the contents of a recording file."""
+    return common.session.get(
         video_recording["download_url"],
         params=[(
                 "access_token",
                 common.zoom_headers()["authorization"][len("Bearer "):]
         )],
         stream=True,
+        **kwargs,
     )
-    with open(Path(f'{zoom_meeting_id}.mp4'), "wb") as f:
-        for chunk in mp4_response.iter_content(chunk_size=1024*1024):
-            f.write(chunk)
 
 
-convert_command = jinja2.Template("""ffmpeg -y -i {{input}} \
+def download_video(
+    zoom_meeting_id,
+    workers=DOWNLOAD_WORKERS,
+    part_size=DOWNLOAD_PART_SIZE,
+) -> Path:
+    """Download the recording of a meeting into the video cache.
+
+    The file is named by the meeting, the recording file and its size, so
+    that a downloaded recording is reused until it changes. Parts of the
+    file are downloaded concurrently over ``workers`` connections into a
+    preallocated file. The finished parts are recorded next to it, so that
+    an interrupted download resumes where it stopped, if the recording and
+    the part size are the same.
+    """
+    video_recording = recording_file(zoom_meeting_id)
+    size = video_recording["file_size"]
+    path = VIDEO_CACHE / f"{zoom_meeting_id}-{video_recording['id']}-{size}.mp4"
+    manifest_path = path.with_name(path.name + ".parts")
+    manifest = {"id": video_recording["id"], "size": size, "part_size": part_size, "done": []}
+    if manifest_path.exists():
+        previous = json.loads(manifest_path.read_text())
+        if all(previous.get(key) == manifest[key] for key in ("id", "size", "part_size")):
+            manifest = previous
+    elif path.exists() and path.stat().st_size == size:
+        logging.info(f"{path} is already downloaded.")
+        path.touch()
+        evict_videos(0, keep=[path])
+        return path
+
+    # Marks the file as incomplete until the download finishes.
+    VIDEO_CACHE.mkdir(parents=True, exist_ok=True)
+    common.atomic_write(manifest_path, json.dumps(manifest).encode())
+    evict_videos(size, keep=[path])
+
+    with get_recording(video_recording, headers={"Range": "bytes=0-0"}) as probe:
+        probe.raise_for_status()
+        ranged = probe.status_code == 206
+    if not ranged:
+        logging.info("Ranged requests unsupported, downloading in one go.")
+        with get_recording(video_recording) as response, open(path, "wb") as f:
+            response.raise_for_status()
+            for chunk in response.iter_content(chunk_size=1024*1024):
+                f.write(chunk)
+        if (downloaded := path.stat().st_size) != size:
+            raise RuntimeError(f"Downloaded {downloaded} bytes instead of {size}.")
+        manifest_path.unlink()
+        return path
+
+    lock = threading.Lock()
+    num_parts = -(-size // part_size)
+    parts = [part for part in range(num_parts) if part not in manifest["done"]]
+    logging.info(f"Downloading {len(parts)} parts of {path} with {workers} connections.")
+
+    def download_part(fd, part):
+        start = part * part_size
+        end = min(start + part_size, size)
+        with get_recording(
+            video_recording, headers={"Range": f"bytes={start}-{end - 1}"}
+        ) as response:
+            response.raise_for_status()
+            offset = start
+            for chunk in response.iter_content(chunk_size=1024*1024):
+                offset += os.pwrite(fd, chunk, offset)
+        if offset != end:
+            raise RuntimeError(f"Part {part} has {offset - start} bytes instead of {end - start}.")
+        with lock:
+            manifest["done"].append(part)
+            common.atomic_write(manifest_path, json.dumps(manifest).encode())
+
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        os.ftruncate(fd, size)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for future in [executor.submit(download_part, fd, part) for part in parts]:
+                future.result()
+    finally:
+        os.close(fd)
+
+    # The file has the right size from the start, so check the parts instead.
+    if missing := set(range(num_parts)) - set(manifest["done"]):
+        raise RuntimeError(f"Parts {sorted(missing)} of {path} are missing.")
+    manifest_path.unlink()
+    return path
+
+
+convert_command = common.template("""ffmpeg -y -i {{input}} \
 -vf "select='{% for i in intervals %}\
 between(t,{{i[0].seconds}},{{i[1].seconds}})\
 {{ "+" if not loop.last }}{% endfor %}', setpts=N/FRAME_RATE/TB" \
@@ -62,9 +212,207 @@ between(t,{{i[0].seconds}},{{i[1].seconds}})\
 {{output}}
 """)
 
-def trim(input: str, intervals: List, output: str):
+def ffprobe(input: str, *args) -> str:
+    return check_output(["ffprobe", "-v", "error", *args, input], text=True)
+
+
+def keyframes(input: str) -> dict:
+    """Return the positions of the video keyframes in decoding order by time."""
+    packets = ffprobe(
+        input, "-select_streams", "v:0",
+        "-show_entries", "packet=pts_time,flags", "-of", "csv=p=0",
+    )
+    return {
+        float(time): position
+        for position, (time, flags) in enumerate(
+            line.split(",")[:2] for line in packets.splitlines() if line
+        )
+        if flags.startswith("K") and time != "N/A"
+    }
+
+
+def trim_segments(intervals: List, keyframes: List[float]) -> List:
+    """Split intervals into segments that are either copied or re-encoded.
+
+    Returns a list of ``(start, end, copy)`` in seconds. Within every
+    interval the whole groups of pictures between the first and the last
+    keyframe are copied, and only the parts before and after are re-encoded.
+    Empty intervals are skipped.
+    """
+    segments = []
+    for start, end in intervals:
+        start, end = start.total_seconds(), end.total_seconds()
+        if end <= start:
+            continue
+        first = keyframes[bisect.bisect_left(keyframes, start):][:1]
+        last = keyframes[:bisect.bisect_right(keyframes, end)][-1:]
+        if not first or not last or first[0] >= last[0]:
+            # No complete group of pictures inside the interval.
+            segments.append((start, end, False))
+            continue
+        if start < first[0]:
+            segments.append((start, first[0], False))
+        segments.append((first[0], last[0], True))
+        if last[0] < end:
+            segments.append((last[0], end, False))
+    return segments
+
+
+def split_segments(segments: List, length: float) -> List:
+    """Split the re-encoded segments into slices of at most ``length`` seconds.
+
+    The slices of a segment are equally long, so that rounding errors never
+    leave an empty slice at its end. Empty segments are skipped.
+    """
+    result = []
+    for start, end, copy in segments:
+        if end <= start:
+            continue
+        if copy:
+            result.append((start, end, copy))
+            continue
+        # The tolerance keeps a multiple of ``length`` from gaining a slice.
+        count = max(1, math.ceil((end - start) / length - 1e-9))
+        bounds = [start + (end - start) * i / count for i in range(count)] + [end]
+        result += [(a, b, False) for a, b in zip(bounds, bounds[1:])]
+    return result
+
+
+def encode_segments(input: str, segments: List, output: str, workers=TRIM_WORKERS):
+    """Encode video segments in parallel and join them without re-encoding.
+
+    ``segments`` are ``(start, end, frames)``, where ``frames`` is the number
+    of video packets to copy, or ``None`` to re-encode the segment. Every
+    worker runs its own ffmpeg process, writing MPEG-TS, which repeats the
+    H.264 parameter sets, so that the segments are joined by the concat
+    demuxer. The audio is always re-encoded, which is cheap and keeps it in
+    sync.
+    """
+    video, = json.loads(ffprobe(
+        input, "-select_streams", "v:0", "-of", "json",
+        "-show_entries", "stream=codec_name,pix_fmt,avg_frame_rate",
+    ))["streams"]
+    if video["codec_name"] != "h264" and any(frames for _, _, frames in segments):
+        raise ValueError(f"Cannot join {video['codec_name']} video with H.264.")
+    threads = str(max(1, (os.cpu_count() or 1) // workers))
+
+    output = Path(output)
+    segments_dir = output.with_name(output.name + ".segments")
+    segments_dir.mkdir(exist_ok=True)
+    paths = [segments_dir / f"{i}.ts" for i in range(len(segments))]
+
+    def encode(path, start, end, frames):
+        check_call([
+            "ffmpeg", "-y", "-hide_banner", "-loglevel", "warning",
+            "-ss", f"{start}", "-i", input, "-t", f"{end - start}",
+            "-map", "0:v:0", "-map", "0:a:0?",
+            *(
+                # A duration would cut copied packets by decoding time,
+                # keeping frames shown after the end.
+                ["-c:v", "copy", "-frames:v", f"{frames}"]
+                if frames
+                else [
+                    "-c:v", "libx264", "-crf", "18", "-threads", threads,
+                    "-pix_fmt", video["pix_fmt"], "-r", video["avg_frame_rate"],
+                ]
+            ),
+            "-c:a", "aac", "-b:a", "128k",
+            "-bsf:v", "h264_mp4toannexb", "-f", "mpegts", path,
+        ])
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for future in [
+                executor.submit(encode, path, *segment)
+                for path, segment in zip(paths, segments)
+            ]:
+                future.result()
+        (segments_dir / "list.txt").write_text(
+            "".join(f"file '{path.name}'\n" for path in paths)
+        )
+        check_call([
+            "ffmpeg", "-y", "-hide_banner", "-loglevel", "warning",
+            "-f", "concat", "-safe", "0", "-i", segments_dir / "list.txt",
+            "-c", "copy", "-movflags", "+faststart", output,
+        ])
+    finally:
+        shutil.rmtree(segments_dir)
+
+    duration = float(ffprobe(
+        str(output), "-show_entries", "format=duration", "-of", "csv=p=0"
+    ))
+    expected = sum(end - start for start, end, _ in segments)
+    if abs(duration - expected) > TRIM_TOLERANCE:
+        raise ValueError(f"Trimmed video is {duration:.1f} s instead of {expected:.1f} s.")
+
+
+def trim_copy(input: str, intervals: List, output: str, workers=TRIM_WORKERS):
+    """Trim a video copying the video stream wherever possible."""
+    positions = keyframes(input)
+    encode_segments(
+        input,
+        [
+            (start, end, positions[end] - positions[start] if copy else None)
+            for start, end, copy in split_segments(
+                trim_segments(intervals, sorted(positions)), TRIM_SLICE
+            )
+        ],
+        output,
+        workers,
+    )
+
+
+def trim_slices(input: str, intervals: List, output: str, workers=TRIM_WORKERS):
+    """Trim a video re-encoding slices of the intervals in parallel."""
+    encode_segments(
+        input,
+        [
+            (start, end, None)
+            for start, end, _ in split_segments(
+                [
+                    (start.total_seconds(), end.total_seconds(), False)
+                    for start, end in intervals
+                ],
+                TRIM_SLICE,
+            )
+        ],
+        output,
+        workers,
+    )
+
+
+def trimmed_video(input: Path, intervals: List, workers=TRIM_WORKERS) -> Path:
+    """Trim a video in the video cache, unless it was trimmed before.
+
+    The trimmed video is named by the input and the intervals, and only
+    appears in the cache once it is complete.
+    """
+    intervals_key = json.dumps(sorted(
+        [start.total_seconds(), end.total_seconds()] for start, end in intervals
+    ))
+    output = input.with_name(
+        f"{input.stem}-{hashlib.sha256(intervals_key.encode()).hexdigest()[:16]}.mp4"
+    )
+    if output.exists():
+        logging.info(f"{output} is already trimmed.")
+        output.touch()
+        evict_videos(0, keep=[output])
+        return output
+
+    evict_videos(input.stat().st_size, keep=[input, output])
+    partial = output.with_name(output.name + ".partial.mp4")
+    trim(str(input), intervals, str(partial), workers)
+    partial.replace(output)
+    return output
+
+
+def trim(input: str, intervals: List, output: str, workers=TRIM_WORKERS):
     """Trim a video.
 
+    Copies the video stream between keyframes with ``trim_copy``, and falls
+    back to re-encoding with ``trim_slices`` and then with a single ffmpeg
+    filter graph.
+
     input : str
         input filename
     intervals : list((start, end))
@@ -72,7 +420,16 @@ def trim(input: str, intervals: List, output: str):
         each timestamp a ``timedelta`` object
     output : str
         output filename
+    workers : int
+        number of segments encoded at the same time
     """
+    for method in (trim_copy, trim_slices):
+        try:
+            method(input, intervals, output, workers)
+            return
+        except (CalledProcessError, ValueError) as e:
+            logging.warning(f"{method.__name__} failed ({e}).")
+
     check_call(
         convert_command.render(
             input=input, intervals=intervals, output=output
@@ -81,6 +438,87 @@ def trim(input: str, intervals: List, output: str):
     )
 
 
+def select_expression(intervals: List) -> str:
+    """Return the ffmpeg expression selecting the times within ``intervals``."""
+    return "+".join(
+        f"between(t,{start.seconds},{end.seconds})" for start, end in intervals
+    )
+
+
+def trim_stream(video_recording: dict, intervals: List) -> Popen:
+    """Start trimming a Zoom recording into a pipe.
+
+    ffmpeg reads the recording over HTTP, seeking with range requests, and
+    writes fragmented mp4 to its stdout, so that neither the recording nor
+    the trimmed video is stored on disk. Without ``intervals`` the recording
+    is only remuxed.
+    """
+    command = [
+        "ffmpeg", "-hide_banner", "-loglevel", "warning",
+        # A header rather than a query parameter keeps the token out of the logs.
+        "-headers", f"Authorization: {common.zoom_headers()['authorization']}\r\n",
+        "-i", video_recording["download_url"],
+    ]
+    if intervals:
+        expression = select_expression(intervals)
+        command += [
+            "-vf", f"select='{expression}', setpts=N/FRAME_RATE/TB",
+            "-af", f"aselect='{expression}', asetpts=N/SR/TB",
+        ]
+    else:
+        command += ["-c", "copy"]
+    command += ["-movflags", "frag_keyframe+empty_moov", "-f", "mp4", "pipe:1"]
+    return Popen(command, stdout=PIPE)
+
+
+class StreamUpload(MediaUpload):
+    """Upload the output of a process while it is being produced.
+
+    Only the chunk that YouTube has not yet acknowledged is kept in memory.
+    The upload fails before its last chunk if the process fails, so that a
+    truncated video is never published.
+    """
+
+    def __init__(self, process: Popen, mimetype="video/mp4", chunksize=UPLOAD_CHUNK_SIZE):
+        super().__init__()
+        self._process = process
+        self._mimetype = mimetype
+        self._chunksize = chunksize
+        self._buffer = bytearray()
+        self._offset = 0  # Position of the buffer start in the stream
+
+    def __str__(self):
+        return f"the output of {self._process.args[0]}"
+
+    def chunksize(self):
+        return self._chunksize
+
+    def mimetype(self):
+        return self._mimetype
+
+    def size(self):
+        return None
+
+    def resumable(self):
+        return True
+
+    def has_stream(self):
+        return False
+
+    def getbytes(self, begin, length):
+        if begin < self._offset:
+            raise RuntimeError("The requested bytes were already discarded.")
+        del self._buffer[:begin - self._offset]
+        self._offset = begin
+        while len(self._buffer) < length:
+            if not (data := self._process.stdout.read(length - len(self._buffer))):
+                if self._process.wait():
+                    raise CalledProcessError(self._process.returncode, self._process.args)
+                break
+            self._buffer += data
+        return bytes(self._buffer[:length])
+
+
 ### Youtube helper functions
 
 def load_credentials():
@@ -124,7 +562,116 @@ def ping_youtube():
     ).execute()
 
 
-def upload(file, title, description, playlist_id):
+def upload_session_path(file) -> Path:
+    """Where the session URI of an unfinished upload of ``file`` is stored."""
+    file = Path(file)
+    return UPLOAD_SESSIONS / f"{file.name}.{file.stat().st_size}.json"
+
+
+def resume_upload(request, uri: str):
+    """Continue an upload session from where YouTube says it stopped.
+
+    Queries the status of the session with an empty ``PUT``, as described by
+    the resumable upload protocol, and sets ``resumable_uri`` and
+    ``resumable_progress`` of the request accordingly. Returns the response
+    if the upload was already complete.
+    """
+    size = request.resumable.size()
+    resp, content = request.http.request(uri, method="PUT", headers={
+        "Content-Length": "0",
+        "Content-Range": f"bytes */{size if size is not None else '*'}",
+    })
+    if resp.status in (200, 201):
+        return request.postproc(resp, content)
+    if resp.status != 308:
+        raise googleapiclient.errors.HttpError(resp, content, uri=uri)
+    request.resumable_uri = uri
+    request.resumable_progress = (
+        int(resp["range"].split("-")[1]) + 1 if "range" in resp else 0
+    )
+
+
+def execute_resumable(request, session_path=None):
+    """Upload the media of an API request in chunks, resuming earlier attempts.
+
+    If ``session_path`` is given, the upload session URI is stored there, so
+    that a later run continues an interrupted upload of the same file. Chunks
+    that fail with a retriable error are retried with exponential backoff.
+    """
+    resume = None
+    if session_path is not None and session_path.exists():
+        resume = json.loads(session_path.read_text())["uri"]
+        logging.info("Resuming an earlier upload.")
+
+    size = request.resumable.size()
+    start, start_progress = monotonic(), 0
+    response, attempt = None, 0
+    while response is None:
+        try:
+            if resume is not None:
+                response = resume_upload(request, resume)
+                resume = None
+                # The bytes uploaded earlier don't count.
+                start, start_progress = monotonic(), request.resumable_progress
+                continue
+            status, response = request.next_chunk()
+        except googleapiclient.errors.HttpError as e:
+            if e.resp.status in (404, 410) and resume is not None:
+                logging.warning("The upload session expired, starting over.")
+                session_path.unlink()
+                resume = None
+                continue
+            if e.resp.status not in UPLOAD_RETRIABLE_STATUS or attempt == UPLOAD_MAX_RETRIES:
+                raise
+            error = e
+        except (httplib2.HttpLib2Error, OSError) as e:
+            if attempt == UPLOAD_MAX_RETRIES:
+                raise
+            error = e
+        else:
+            attempt = 0
+            if (
+                session_path is not None
+                and not session_path.exists()
+                and request.resumable_uri is not None
+            ):
+                session_path.parent.mkdir(parents=True, exist_ok=True)
+                common.atomic_write(
+                    session_path, json.dumps({"uri": request.resumable_uri}).encode()
+                )
+            if status is not None:
+                rate = (status.resumable_progress - start_progress) / (monotonic() - start)
+                logging.info(
+                    f"Uploaded {status.resumable_progress / 2**20:.0f}"
+                    + (f" of {size / 2**20:.0f}" if size is not None else "")
+                    + f" MiB at {rate / 2**20:.1f} MiB/s."
+                )
+            continue
+
+        delay = 2**attempt * random.uniform(0.5, 1.5)
+        attempt += 1
+        logging.warning(f"Upload failed ({error}), retrying in {delay:.1f} s.")
+        sleep(delay)
+
+    if session_path is not None and session_path.exists():
+        session_path.unlink()
+    return response
+
+
+def upload(file, title, description, playlist_id, chunk_size=UPLOAD_CHUNK_SIZE):
+    """Upload a video to YouTube and add it to a playlist.
+
+    ``file`` is either a filename or a ``MediaUpload``, such as
+    ``StreamUpload``. Only uploads of files are resumed by later runs.
+    """
+    if isinstance(file, MediaUpload):
+        media, session_path = file, None
+    else:
+        media = MediaFileUpload(
+            file, mimetype="video/mp4", chunksize=chunk_size, resumable=True
+        )
+        session_path = upload_session_path(file)
+
     youtube = googleapiclient.discovery.build(
         "youtube", "v3", credentials=credentials()
     )
@@ -143,11 +690,14 @@ def upload(file, title, description, playlist_id):
             },
         },
 
-        media_body=MediaFileUpload(file)
+        media_body=media,
     )
     logging.info(f"Uploading {file} to youtube.")
-    result = request.execute()
-    logging.info(f"Finished uploading.")
+    start = monotonic()
+    result = execute_resumable(request, session_path)
+    logging.info(
+        f"Finished uploading in {monotonic() - start:.0f} s."
+    )
     video_id = result["id"]
 
     try:
@@ -219,33 +769,28 @@ playlists = {
 }
 
 
-if __name__ == "__main__":
-    ping_youtube()
-    yaml = common.yaml
-    logger = logging.getLogger()
-    logger.setLevel(logging.INFO)
-    repo = common.vsf_repo()
-    issue = repo.get_issue(int(os.environ["ISSUE_NUMBER"]))
-    logger.info(f"Parsing issue {issue.number}")
-    if (intervals := intervals_from_issue(issue)) is None:
-        sys.exit("Invalid publication request")
-    talks, _ = common.talks_data(repo=repo)
-    talk = next(
-        talk for talk in talks if talk["workflow_issue"] == issue.number
-    )
-    logger.info("Downloading the video.")
-    meeting_id = talk["zoom_meeting_id"]
-    download_video(talk["zoom_meeting_id"])
+def publish(talk, intervals: List) -> str:
+    """Download, trim and upload the recording of a talk.
 
-    if intervals:
-        logger.info(f"Trimming with intervals {intervals}.")
-        upload_fname = f"{meeting_id}_trimmed.mp4"
-        trim(f"{meeting_id}.mp4", intervals, upload_fname)
+    Returns the YouTube id of the video.
+    """
+    meeting_id = talk["zoom_meeting_id"]
+    used = []
+    process = None
+    if STREAM_VIDEO:
+        logging.info(f"Streaming the video of {meeting_id} with intervals {intervals}.")
+        process = trim_stream(recording_file(meeting_id), intervals)
+        upload_fname = StreamUpload(process)
     else:
-        # Uploading the complete video
-        upload_fname = f"{meeting_id}.mp4"
-
-    logger.info("Uploading the video.")
+        logging.info(f"Downloading the video of {meeting_id}.")
+        upload_fname = download_video(meeting_id)
+        used.append(upload_fname)
+        if intervals:
+            logging.info(f"Trimming {meeting_id} with intervals {intervals}.")
+            upload_fname = trimmed_video(upload_fname, intervals)
+            used.append(upload_fname)
+
+    logging.info(f"Uploading the video of {meeting_id}.")
     title = f"“{talk['title']}” by {talk['speaker_name']}"[:100]
     abstract = (
         (
@@ -261,35 +806,144 @@ if __name__ == "__main__":
         + talk['abstract']
     )[:1000]
 
-    talk["youtube_id"] = upload(
-        upload_fname,
-        sanitize_for_youtube(title),
-        sanitize_for_youtube(abstract),
-        playlist_id=playlists[talk["event_type"]],
-    )
-    logger.info(f"Uploaded {talk['youtube_id']}")
-    talk = {
-        k: v for k, v in talk.items()
-        if k not in 'zoom_meeting_id email registration_url'.split()
-    }
+    try:
+        youtube_id = upload(
+            upload_fname,
+            sanitize_for_youtube(title),
+            sanitize_for_youtube(abstract),
+            playlist_id=playlists[talk["event_type"]],
+        )
+    except BaseException:
+        if process is not None:
+            # Otherwise ffmpeg stays blocked writing to the pipe.
+            process.kill()
+            process.wait()
+        raise
+    finally:
+        with video_cache_lock:
+            videos_in_use.difference_update(used)
+    discard_videos(used)
+    logging.info(f"Uploaded {meeting_id} as {youtube_id}")
+    return youtube_id
+
+
+def announce(issue, youtube_id: str):
+    """Tell the workflow issue about the published video and close it."""
+    issue.create_comment(f"I uploaded the video to https://youtu.be/{youtube_id} 🎉!")
+    issue.edit(state="closed")
 
-    # Get the data again because someone might have pushed in the meantime.
-    talks, sha = common.talks_data()
-    talks = [
-        t if t["workflow_issue"] != issue.number else talk
-        for t in talks
-    ]
 
-    commit_message = f"add a youtube id to the talk from {issue.number}"
-    serialized = StringIO()
-    yaml.dump(talks, serialized)
+def approved_talks(repo, talks):
+    """Iterate over the open workflow issues approving to publish a past recording.
+
+    Yields the talk, its workflow issue and the intervals to publish.
+    """
+    now = datetime.datetime.now(tz=datetime.timezone.utc)
+    for issue in repo.get_issues(state="open"):
+        if issue.pull_request is not None:
+            continue
+        talk = talks.get("workflow_issue", issue.number)
+        if (
+            talk is None
+            or "zoom_meeting_id" not in talk
+            or "youtube_id" in talk
+            or talk["time"] > now
+        ):
+            continue
+        if (intervals := intervals_from_issue(issue)) is not None:
+            yield talk, issue, intervals
+
 
-    repo.update_file(
-        common.TALKS_FILE,
-        commit_message,
-        serialized.getvalue(),
-        sha=sha,
-        branch="master",
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Publish talk recordings on YouTube.")
+    parser.add_argument(
+        "--all", action="store_true",
+        help="publish all approved recordings instead of the one from ISSUE_NUMBER",
     )
-    issue.create_comment(f"I uploaded the video to https://youtu.be/{talk['youtube_id']} 🎉!")
-    issue.edit(state="closed")
+    args = parser.parse_args()
+    ping_youtube()
+    logger = logging.getLogger()
+    logger.setLevel(logging.INFO)
+    repo = common.vsf_repo()
+    talk_changes = common.TalkChangeQueue()
+
+    # Videos uploaded by earlier runs that failed to record them are recorded
+    # first, so that they are not uploaded again. Those that still can't be
+    # recorded are skipped.
+    unrecorded = set()
+    if earlier := {
+        number: changes["youtube_id"]
+        for number, changes in talk_changes.queued().items()
+        if "youtube_id" in changes
+    }:
+        updated = talk_changes.flush(repo)
+        for number, youtube_id in earlier.items():
+            if updated.get(number):
+                announce(repo.get_issue(number), youtube_id)
+            else:
+                unrecorded.add(number)
+
+    # Talks awaiting publication are never archived, see migrate_talks.py.
+    talks = common.read_talks(
+        repo=repo, since=datetime.datetime.now(tz=datetime.timezone.utc)
+    )
+    if args.all:
+        requests = [
+            (talk, issue, intervals)
+            for talk, issue, intervals in approved_talks(repo, talks)
+            if issue.number not in unrecorded
+        ]
+        logger.info(f"Found {len(requests)} approved recordings.")
+    else:
+        issue = repo.get_issue(int(os.environ["ISSUE_NUMBER"]))
+        logger.info(f"Parsing issue {issue.number}")
+        if (intervals := intervals_from_issue(issue)) is None:
+            sys.exit("Invalid publication request")
+        if (talk := talks.get("workflow_issue", issue.number)) is None:
+            sys.exit(f"No talk with workflow issue {issue.number}")
+        if "youtube_id" in talk or issue.number in unrecorded:
+            logger.info(f"The video of issue {issue.number} is already published.")
+            sys.exit()
+        requests = [(talk, issue, intervals)]
+
+    exceptions = common.CollectExceptions()
+    status = {issue.number: "failed" for _, issue, _ in requests}
+    published = {}
+    with ThreadPoolExecutor(max_workers=PUBLISH_WORKERS) as executor:
+        uploads = {
+            executor.submit(publish, talk, intervals): issue
+            for talk, issue, intervals in requests
+        }
+        for future in as_completed(uploads):
+            issue = uploads[future]
+            with exceptions:
+                try:
+                    youtube_id = future.result()
+                except Exception as e:
+                    status[issue.number] = f"failed ({e})"
+                    raise
+                # Queued right away, so that the YouTube id is not lost if the commit fails.
+                talk_changes.add(
+                    issue.number,
+                    {
+                        "youtube_id": youtube_id,
+                        "zoom_meeting_id": None,
+                        "email": None,
+                        "registration_url": None,
+                    },
+                    f"add a youtube id to the talk from {issue.number}",
+                )
+                published[issue.number] = issue, youtube_id
+                status[issue.number] = f"uploaded to https://youtu.be/{youtube_id}"
+
+    if published:
+        updated = talk_changes.flush(repo)
+        for number, (issue, youtube_id) in published.items():
+            if not updated.get(number):
+                status[number] += ", but the talk was not updated"
+                continue
+            announce(issue, youtube_id)
+
+    for number, issue_status in status.items():
+        logger.info(f"Issue {number}: {issue_status}")
+    exceptions.reraise()